@@ -0,0 +1,132 @@
+"""Adaptive choice of exercise difficulty and subtopic per student."""
+import json
+import math
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import ADAPTIVE_TARGET_SUCCESS
+from database import Database
+
+db = Database("./tutor_memory")
+
+# Elo ratings of the difficulty levels; students start between Basic and Intermediate
+DIFFICULTY_RATINGS = {"Basic": 800.0, "Intermediate": 1000.0, "Advanced": 1200.0}
+INITIAL_RATING = 1100.0
+K_FACTOR = 32.0
+# Subtopics remembered per topic (most recently practiced first)
+MAX_SUBTOPICS = 8
+
+
+def expected_success(student_rating: float, item_rating: float) -> float:
+    """Elo win probability of the student against an item."""
+    return 1.0 / (1.0 + 10 ** ((item_rating - student_rating) / 400.0))
+
+
+class AdaptiveSelector:
+    """
+    Per-student Elo ratings per topic and subtopic, updated after every
+    exercise answer and flashcard review.
+
+    ``choose`` picks the subtopic with a UCB1 bandit that favours weak and
+    rarely practiced subtopics, then the difficulty whose expected success
+    rate is closest to ADAPTIVE_TARGET_SUCCESS. Both updates and choices
+    touch a fixed number of values (at most MAX_SUBTOPICS per topic and
+    three difficulty levels), never the attempt history.
+    """
+
+    def __init__(self, student_id: str):
+        self.student_id = student_id
+        self._lock = threading.Lock()
+        self.state = self._load()
+
+    def choose(self, topic: str) -> Tuple[str, str]:
+        """(subtopic, difficulty) for the student's next exercise on ``topic``."""
+        with self._lock:
+            topic_state = self._topic(topic)
+            subtopics = topic_state["subtopics"]
+            if not subtopics:
+                return "General", self._difficulty_for(topic_state["rating"])
+
+            total = sum(stats["n"] for stats in subtopics.values())
+            best, best_score = None, -1.0
+            for name, stats in subtopics.items():
+                need = 1.0 - expected_success(stats["rating"], DIFFICULTY_RATINGS["Intermediate"])
+                bonus = math.sqrt(2 * math.log(total + 1) / (stats["n"] + 1))
+                if need + bonus > best_score:
+                    best, best_score = name, need + bonus
+            return best, self._difficulty_for(subtopics[best]["rating"])
+
+    def record_result(self, topic: str, subtopic: Optional[str], difficulty: str, correct: bool):
+        """Update ratings after an exercise answer."""
+        with self._lock:
+            self._update(topic, subtopic, DIFFICULTY_RATINGS.get(difficulty, DIFFICULTY_RATINGS["Intermediate"]), correct)
+        self._save()
+
+    def record_reviews(self, reviews: Iterable[Tuple[str, Optional[str], int]]):
+        """Update ratings from flashcard reviews given as (topic, subtopic, quality 0-5)."""
+        with self._lock:
+            for topic, subtopic, quality in reviews:
+                # Recalling a card counts as a Basic-level item
+                self._update(topic, subtopic, DIFFICULTY_RATINGS["Basic"], quality >= 3)
+        self._save()
+
+    def _update(self, topic: str, subtopic: Optional[str], item_rating: float, correct: bool):
+        score = 1.0 if correct else 0.0
+        topic_state = self._topic(topic)
+        topic_state["rating"] += K_FACTOR * (score - expected_success(topic_state["rating"], item_rating))
+
+        if subtopic and subtopic != "General":
+            subtopics = topic_state["subtopics"]
+            stats = subtopics.pop(subtopic, None) or {"rating": topic_state["rating"], "n": 0}
+            stats["rating"] += K_FACTOR * (score - expected_success(stats["rating"], item_rating))
+            stats["n"] += 1
+            # Re-insert as most recent and forget the least recently practiced
+            subtopics[subtopic] = stats
+            while len(subtopics) > MAX_SUBTOPICS:
+                del subtopics[next(iter(subtopics))]
+
+    def _topic(self, topic: str) -> Dict:
+        topics = self.state.setdefault("topics", {})
+        if topic not in topics:
+            # Start with the subtopics the student has asked about in chat
+            covered = (db.get_progress(self.student_id) or {}).get("topics_covered", {}).get(topic, [])
+            topics[topic] = {
+                "rating": INITIAL_RATING,
+                "subtopics": {name: {"rating": INITIAL_RATING, "n": 0} for name in covered[-MAX_SUBTOPICS:] if name != "General"}
+            }
+        return topics[topic]
+
+    @staticmethod
+    def _difficulty_for(rating: float) -> str:
+        return min(DIFFICULTY_RATINGS, key=lambda level: abs(
+            expected_success(rating, DIFFICULTY_RATINGS[level]) - ADAPTIVE_TARGET_SUCCESS
+        ))
+
+    def _load(self) -> Dict:
+        try:
+            data = db.progress_db.get(ids=[f"{self.student_id}_adaptive"])
+            if data and data.get("documents"):
+                return json.loads(data["documents"][0])
+        except Exception as e:
+            print(f"Error loading adaptive state: {e}")
+        return {"topics": {}}
+
+    def _save(self):
+        with self._lock:
+            document = json.dumps(self.state)
+        try:
+            db.progress_db.upsert(documents=[document], ids=[f"{self.student_id}_adaptive"])
+        except Exception as e:
+            print(f"Error saving adaptive state: {e}")
+
+
+_selectors: Dict[str, AdaptiveSelector] = {}
+_selectors_lock = threading.Lock()
+
+
+def get_selector(student_id: str) -> AdaptiveSelector:
+    """Shared selector per student, so exercises and flashcards update the same state."""
+    with _selectors_lock:
+        if student_id not in _selectors:
+            _selectors[student_id] = AdaptiveSelector(student_id)
+        return _selectors[student_id]
@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List
 from database import Database
 from utils import calculate_streak, format_time_ago
+from flashcards import load_flashcard_statistics
 
 db = Database("./tutor_memory")
 
@@ -25,6 +26,8 @@ class AnalyticsDashboard:
             "topic_analysis": self._get_topic_analysis(progress, conversations),
             "performance_metrics": self._get_performance_metrics(progress, conversations),
             "time_analysis": self._get_time_analysis(conversations),
+            # Persisted counters, so the deck itself is not loaded
+            "flashcards": load_flashcard_statistics(self.student_id),
             "recommendations": self._generate_recommendations(progress, conversations)
         }
         
@@ -0,0 +1,154 @@
+"""Append-only log of exercise and quiz attempts with running accuracy rollups."""
+import json
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from database import Database
+
+db = Database("./tutor_memory")
+
+
+def _empty_rollups() -> Dict:
+    return {"total": 0, "correct": 0, "by_topic": {}, "by_difficulty": {}}
+
+
+def _bump(bucket: Dict, name: str, correct: bool):
+    counts = bucket.setdefault(name, {"total": 0, "correct": 0})
+    counts["total"] += 1
+    counts["correct"] += 1 if correct else 0
+
+
+class AttemptLog:
+    """
+    Every answer a student submits, one document per attempt, never rewritten.
+
+    Attempts reference library exercises by id instead of copying them.
+    Correct/total counts overall, per topic and per difficulty are updated
+    with each append and stored in one small document, so accuracy queries
+    never read the log itself.
+    """
+
+    def __init__(self, student_id: str):
+        self.student_id = student_id
+        self._lock = threading.Lock()
+        self._rollups = self._load_rollups()
+        if self._rollups is None:
+            self._rollups = _empty_rollups()
+            self._migrate_legacy_attempts()
+
+    def record(self, exercise: Dict, user_answer: Any, correct: bool) -> Dict:
+        """Append an attempt and update the rollups."""
+        with self._lock:
+            sequence = self._rollups["total"]
+            attempt = {
+                "sequence": sequence,
+                "exercise_id": exercise.get("id"),
+                "type": exercise.get("type"),
+                "topic": exercise.get("topic"),
+                "subtopic": exercise.get("subtopic"),
+                "difficulty": exercise.get("difficulty"),
+                "user_answer": user_answer,
+                "correct": bool(correct),
+                "timestamp": str(datetime.now())
+            }
+            if not attempt["exercise_id"]:
+                # Not a library exercise (e.g. a placeholder), keep the question for context
+                attempt["question"] = exercise.get("question")
+            self._append([attempt])
+            self._apply(attempt)
+            self._save_rollups()
+            return attempt
+
+    def accuracy(self, topic: Optional[str] = None, difficulty: Optional[str] = None) -> Dict:
+        """Correct/total and accuracy overall, for a topic or for a difficulty."""
+        with self._lock:
+            if topic is not None:
+                counts = self._rollups["by_topic"].get(topic, {"total": 0, "correct": 0})
+            elif difficulty is not None:
+                counts = self._rollups["by_difficulty"].get(difficulty, {"total": 0, "correct": 0})
+            else:
+                counts = self._rollups
+            total, correct = counts["total"], counts["correct"]
+        return {"total": total, "correct": correct, "accuracy": correct / total if total else 0.0}
+
+    def _apply(self, attempt: Dict):
+        correct = attempt["correct"]
+        self._rollups["total"] += 1
+        self._rollups["correct"] += 1 if correct else 0
+        _bump(self._rollups["by_topic"], attempt.get("topic") or "General", correct)
+        _bump(self._rollups["by_difficulty"], attempt.get("difficulty") or "Intermediate", correct)
+
+    def _append(self, attempts: List[Dict]):
+        try:
+            db.attempt_db.add(
+                documents=[json.dumps(attempt) for attempt in attempts],
+                # Random ids: the sequence is only an ordering hint and must not collide
+                ids=[f"{self.student_id}_attempt_{uuid.uuid4().hex}" for _ in attempts],
+                metadatas=[{"student_id": self.student_id} for _ in attempts]
+            )
+        except Exception as e:
+            print(f"Error saving attempt: {e}")
+
+    def _save_rollups(self):
+        try:
+            db.progress_db.upsert(
+                documents=[json.dumps(self._rollups)],
+                ids=[f"{self.student_id}_attempt_rollups"]
+            )
+        except Exception as e:
+            print(f"Error saving attempt rollups: {e}")
+
+    def _load_rollups(self) -> Optional[Dict]:
+        try:
+            data = db.progress_db.get(ids=[f"{self.student_id}_attempt_rollups"])
+            if data and data.get("documents"):
+                return json.loads(data["documents"][0])
+        except Exception as e:
+            print(f"Error loading attempt rollups: {e}")
+        return None
+
+    def _migrate_legacy_attempts(self):
+        """Move the old capped attempts blob (full exercise copies) into the log."""
+        legacy_id = f"{self.student_id}_quiz_attempts"
+        try:
+            data = db.progress_db.get(ids=[legacy_id])
+            if not data or not data.get("documents"):
+                return
+            attempts = []
+            for old in json.loads(data["documents"][0]):
+                exercise = old.get("exercise") or {}
+                attempt = {
+                    "sequence": len(attempts),
+                    "exercise_id": exercise.get("id"),
+                    "type": exercise.get("type"),
+                    "topic": exercise.get("topic"),
+                    "subtopic": exercise.get("subtopic"),
+                    "difficulty": exercise.get("difficulty"),
+                    "user_answer": old.get("user_answer"),
+                    "correct": bool(old.get("correct")),
+                    "timestamp": old.get("timestamp")
+                }
+                if not attempt["exercise_id"]:
+                    attempt["question"] = exercise.get("question")
+                attempts.append(attempt)
+                self._apply(attempt)
+            if attempts:
+                self._append(attempts)
+            self._save_rollups()
+            db.progress_db.delete(ids=[legacy_id])
+        except Exception as e:
+            print(f"Error migrating quiz attempts: {e}")
+
+
+_logs: Dict[str, AttemptLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_attempt_log(student_id: str) -> AttemptLog:
+    """Shared log per student, so every session appends to the same rollups."""
+    with _logs_lock:
+        if student_id not in _logs:
+            _logs[student_id] = AttemptLog(student_id)
+        return _logs[student_id]
@@ -0,0 +1,196 @@
+"""In-process background work queue with a crash-safe spill-to-disk journal."""
+import atexit
+import json
+import os
+import queue
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from config import BACKGROUND_JOURNAL_PATH, BACKGROUND_JOURNAL_COMPACT_EVERY
+
+
+class BackgroundQueue:
+    """
+    Run side effects (progress saves, achievement checks, conversation storage)
+    off the request path.
+
+    Every task is appended to a JSONL journal before it is queued and marked
+    done once its handler returns, so tasks interrupted by a crash are replayed
+    on the next start. Delivery is at-least-once, handlers should tolerate a
+    replay. Handlers are registered by name so journaled tasks can be resolved
+    again after a restart.
+
+    ``submit`` only writes and flushes (enough to survive a process crash);
+    the worker fsyncs the journal before running a task, so the request
+    thread never waits on the disk. Once ``compact_every`` tasks have
+    completed, the journal is rewritten with just the unfinished tasks.
+    """
+
+    def __init__(self, journal_path: str = BACKGROUND_JOURNAL_PATH,
+                 compact_every: int = BACKGROUND_JOURNAL_COMPACT_EVERY):
+        self.journal_path = journal_path
+        self.compact_every = max(1, compact_every)
+        self._handlers: Dict[str, Callable[[Dict], Any]] = {}
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._unsynced = False
+        self._completed_since_compaction = 0
+        self._notifications_lock = threading.Lock()
+        self._notifications: Dict[str, List[Dict]] = {}
+        self._pending_replay: List[Dict] = self._read_pending()
+        # Journaled tasks that have not completed, as the compacted journal would hold them
+        self._unfinished: Dict[str, Dict] = {task["id"]: task for task in self._pending_replay}
+        self._worker: Optional[threading.Thread] = None
+        atexit.register(self.shutdown)
+
+    def register(self, kind: str, handler: Callable[[Dict], Any]):
+        """Register a handler and replay any journaled tasks of that kind."""
+        self._handlers[kind] = handler
+        replay = [task for task in self._pending_replay if task["kind"] == kind]
+        self._pending_replay = [task for task in self._pending_replay if task["kind"] != kind]
+        for task in replay:
+            self._enqueue(task)
+
+    def submit(self, kind: str, payload: Dict) -> str:
+        """Journal a task and queue it for the worker. Returns the task id."""
+        task = {"id": uuid.uuid4().hex, "kind": kind, "payload": payload}
+        with self._journal_lock:
+            self._unfinished[task["id"]] = task
+            self._append_journal({"op": "add", **task})
+        self._enqueue(task)
+        return task["id"]
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued tasks are processed. Returns False on timeout."""
+        done = threading.Event()
+
+        def _wait():
+            self._queue.join()
+            done.set()
+
+        threading.Thread(target=_wait, daemon=True).start()
+        return done.wait(timeout)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Give queued tasks a chance to finish; leftovers stay in the journal."""
+        if self._worker and self._worker.is_alive():
+            self.join(timeout)
+
+    def notify(self, student_id: str, item: Dict):
+        """Queue a notification to be shown to the student on the next render."""
+        with self._notifications_lock:
+            self._notifications.setdefault(student_id, []).append(item)
+
+    def drain_notifications(self, student_id: str) -> List[Dict]:
+        """Return and clear pending notifications for a student."""
+        with self._notifications_lock:
+            return self._notifications.pop(student_id, [])
+
+    def _enqueue(self, task: Dict):
+        self._ensure_worker()
+        self._queue.put(task)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="background-queue", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                self._sync_journal()
+                handler = self._handlers.get(task["kind"])
+                if handler is None:
+                    print(f"No background handler registered for {task['kind']}")
+                    continue
+                handler(task["payload"])
+                self._complete(task["id"])
+            except Exception as e:
+                # Leave the task in the journal so it is retried on next start
+                print(f"Background task {task.get('kind')} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _complete(self, task_id: str):
+        """Mark a task done, compacting the journal every ``compact_every`` completions."""
+        with self._journal_lock:
+            self._unfinished.pop(task_id, None)
+            self._completed_since_compaction += 1
+            if self._completed_since_compaction < self.compact_every:
+                self._append_journal({"op": "done", "id": task_id})
+                return
+            try:
+                self._rewrite_journal(list(self._unfinished.values()))
+                self._completed_since_compaction = 0
+                self._unsynced = False
+            except Exception as e:
+                print(f"Error compacting background journal: {e}")
+                self._append_journal({"op": "done", "id": task_id})
+
+    def _append_journal(self, record: Dict):
+        """Append a record (caller holds the journal lock). Flushed, not fsynced."""
+        try:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            self._unsynced = True
+        except Exception as e:
+            print(f"Error writing background journal: {e}")
+
+    def _sync_journal(self):
+        """fsync records written since the last sync (called from the worker)."""
+        with self._journal_lock:
+            if not self._unsynced:
+                return
+            self._unsynced = False
+            try:
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"Error syncing background journal: {e}")
+
+    def _rewrite_journal(self, tasks: List[Dict]):
+        """Atomically replace the journal with ``add`` records for ``tasks``."""
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for task in tasks:
+                f.write(json.dumps({"op": "add", **task}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    def _read_pending(self) -> List[Dict]:
+        """Load unfinished tasks from the journal and compact it."""
+        if not os.path.exists(self.journal_path):
+            return []
+
+        pending: Dict[str, Dict] = {}
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn write from a crash
+                    if record.get("op") == "add":
+                        pending[record["id"]] = {
+                            "id": record["id"],
+                            "kind": record["kind"],
+                            "payload": record["payload"]
+                        }
+                    elif record.get("op") == "done":
+                        pending.pop(record.get("id"), None)
+
+            # Rewrite the journal with only the unfinished tasks
+            self._rewrite_journal(list(pending.values()))
+        except Exception as e:
+            print(f"Error reading background journal: {e}")
+
+        return list(pending.values())
+
+
+# Shared queue for the process
+BACKGROUND = BackgroundQueue()
@@ -1,9 +1,92 @@
 """Code execution and visualization for programming exercises."""
+import os
 import subprocess
 import sys
 import io
 import contextlib
-from typing import Dict, Any, Optional
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from config import CODE_TEST_MAX_WORKERS, CODE_MEMORY_LIMIT_MB, CODE_OUTPUT_LIMIT_CHARS
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Shared by every submission, so concurrent students cannot start more than
+# CODE_TEST_MAX_WORKERS code processes between them
+_PROCESS_SLOTS = threading.BoundedSemaphore(max(1, CODE_TEST_MAX_WORKERS))
+
+# Largest file the submitted code may write in its working directory
+_FILE_SIZE_LIMIT = 1024 * 1024
+
+# Runs before the submitted code. Audit hooks cannot be removed once added, so
+# this confines file access to the temporary working directory (plus reading
+# the Python installation for imports) and refuses subprocesses, sockets and
+# ctypes. It is a guard against casual snooping, not a full sandbox: run the
+# app as an unprivileged user as well.
+_SANDBOX_PRELUDE = """
+def _install_sandbox():
+    import os, sys
+    realpath, fsdecode, sep = os.path.realpath, os.fsdecode, os.sep
+    workdir = realpath(os.getcwd())
+    readable = tuple({realpath(p) for p in (sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix)})
+    write_flags = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+    blocked = {"os.system", "os.exec", "os.posix_spawn", "os.spawn", "os.fork", "os.forkpty", "os.kill",
+               "os.putenv", "subprocess.Popen", "socket.__new__", "ctypes.dlopen", "ctypes.dlsym",
+               "ctypes.cdata", "ctypes.call_function", "gc.get_objects", "gc.get_referrers",
+               "gc.get_referents", "sys._current_frames"}
+    listing = {"os.listdir", "os.scandir"}
+    path_events = {"os.listdir": 1, "os.scandir": 1, "os.remove": 1, "os.rmdir": 1, "os.mkdir": 1,
+                   "os.chmod": 1, "os.chown": 1, "os.truncate": 1, "os.utime": 1, "os.chdir": 1,
+                   "os.rename": 2, "os.link": 2, "os.symlink": 2, "shutil.copyfile": 2}
+
+    def under(path, roots):
+        if path is None or isinstance(path, int):
+            return True
+        path = realpath(fsdecode(path))
+        return any(path == root or path.startswith(root.rstrip(sep) + sep) for root in roots)
+
+    def hook(event, args):
+        if event in blocked:
+            raise PermissionError(event + " is not allowed here")
+        if event == "open":
+            path, mode, flags = args
+            writing = bool(set(mode or "") & set("wax+")) or bool((flags or 0) & write_flags)
+            if not under(path, (workdir,)) and (writing or not under(path, readable)):
+                raise PermissionError("Access outside the working directory is not allowed")
+        elif event in path_events:
+            # The import system lists the installation's directories
+            roots = (workdir,) + readable if event in listing else (workdir,)
+            if not all(under(path, roots) for path in args[:path_events[event]]):
+                raise PermissionError("Access outside the working directory is not allowed")
+
+    sys.addaudithook(hook)
+
+_install_sandbox()
+del _install_sandbox
+"""
+
+
+def _limit_resources(timeout: float):
+    """Resource limits applied in the child process before Python starts."""
+    cpu_seconds = int(timeout) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    memory = CODE_MEMORY_LIMIT_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (_FILE_SIZE_LIMIT, _FILE_SIZE_LIMIT))
+
+
+def _truncate(text: Optional[str]) -> Optional[str]:
+    """Cap output shown back to the student."""
+    if text is None or len(text) <= CODE_OUTPUT_LIMIT_CHARS:
+        return text
+    return text[:CODE_OUTPUT_LIMIT_CHARS] + f"... ({len(text) - CODE_OUTPUT_LIMIT_CHARS} more characters)"
+
 
 class CodeExecutor:
     """Execute and test code safely."""
@@ -50,12 +133,64 @@ class CodeExecutor:
             }
     
     @staticmethod
-    def test_code(code: str, test_cases: List[Dict]) -> Dict[str, Any]:
-        """Test code against test cases."""
-        results = []
-        all_passed = True
-        
-        for i, test_case in enumerate(test_cases):
+    def run_isolated(code: str, timeout: float = 5) -> Dict[str, Any]:
+        """
+        Run untrusted code in a separate Python process and time it. The process
+        gets an empty working directory, no environment beyond PATH, no stdin,
+        CPU, memory, process and file-size limits, and the sandbox prelude.
+        Waiting for a free process slot does not count towards the timeout.
+        Returns the complete output; use ``_truncate`` before showing it.
+        """
+        started = time.perf_counter()
+        try:
+            with _PROCESS_SLOTS, tempfile.TemporaryDirectory() as workdir:
+                started = time.perf_counter()
+                completed = subprocess.run(
+                    [sys.executable, "-I", "-c", _SANDBOX_PRELUDE + code],
+                    # input() must not read the server's stdin
+                    stdin=subprocess.DEVNULL,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    cwd=workdir,
+                    env={"PATH": os.environ.get("PATH", os.defpath)},
+                    preexec_fn=(lambda: _limit_resources(timeout)) if resource else None
+                )
+            duration_ms = (time.perf_counter() - started) * 1000
+            if completed.returncode == 0:
+                return {"success": True, "output": completed.stdout, "error": _truncate(completed.stderr) or None, "duration_ms": duration_ms}
+            # Last line of the traceback, e.g. "NameError: name 'x' is not defined"
+            error_lines = completed.stderr.strip().splitlines()
+            if error_lines:
+                error = error_lines[-1]
+            elif completed.returncode < 0:
+                error = "Stopped after exceeding its CPU, memory or file size limit"
+            else:
+                error = f"Exited with status {completed.returncode}"
+            return {
+                "success": False,
+                "output": completed.stdout,
+                "error": _truncate(error),
+                "duration_ms": duration_ms
+            }
+        except subprocess.TimeoutExpired:
+            return {
+                "success": False,
+                "output": None,
+                "error": f"Timed out after {timeout} seconds",
+                "timed_out": True,
+                "duration_ms": (time.perf_counter() - started) * 1000
+            }
+    
+    @staticmethod
+    def test_code(code: str, test_cases: List[Dict], timeout: float = 5) -> Dict[str, Any]:
+        """
+        Test code against test cases. Each test case runs in its own process and
+        they run concurrently, sharing the process-wide limit of
+        CODE_TEST_MAX_WORKERS processes with every other submission.
+        Outputs in the results are truncated for display.
+        """
+        def run_case(i: int, test_case: Dict) -> Dict:
             test_input = test_case.get("input", "")
             expected_output = test_case.get("expected_output", "")
             
@@ -69,45 +204,50 @@ result = {test_input}
 print(result)
 """
                 
-                exec_result = CodeExecutor.execute_code(test_code)
+                exec_result = CodeExecutor.run_isolated(test_code, timeout)
                 
                 if exec_result["success"]:
                     actual_output = exec_result["output"].strip()
-                    passed = str(actual_output) == str(expected_output)
-                    all_passed = all_passed and passed
-                    
-                    results.append({
-                        "test_case": i + 1,
-                        "input": test_input,
-                        "expected": expected_output,
-                        "actual": actual_output,
-                        "passed": passed
-                    })
-                else:
-                    all_passed = False
-                    results.append({
+                    return {
                         "test_case": i + 1,
                         "input": test_input,
                         "expected": expected_output,
-                        "actual": None,
-                        "passed": False,
-                        "error": exec_result["error"]
-                    })
+                        "actual": _truncate(actual_output),
+                        "passed": actual_output == str(expected_output).strip(),
+                        "duration_ms": exec_result["duration_ms"]
+                    }
+                return {
+                    "test_case": i + 1,
+                    "input": test_input,
+                    "expected": expected_output,
+                    "actual": None,
+                    "passed": False,
+                    "error": exec_result["error"],
+                    "timed_out": exec_result.get("timed_out", False),
+                    "duration_ms": exec_result["duration_ms"]
+                }
             except Exception as e:
-                all_passed = False
-                results.append({
+                return {
                     "test_case": i + 1,
                     "input": test_input,
                     "expected": expected_output,
                     "actual": None,
                     "passed": False,
-                    "error": str(e)
-                })
+                    "error": str(e),
+                    "duration_ms": 0.0
+                }
+        
+        started = time.perf_counter()
+        results = []
+        if test_cases:
+            with ThreadPoolExecutor(max_workers=max(1, min(CODE_TEST_MAX_WORKERS, len(test_cases)))) as pool:
+                results = list(pool.map(lambda args: run_case(*args), enumerate(test_cases)))
         
+        passed_tests = sum(1 for r in results if r.get("passed", False))
         return {
-            "all_passed": all_passed,
+            "all_passed": passed_tests == len(test_cases),
             "total_tests": len(test_cases),
-            "passed_tests": sum(1 for r in results if r.get("passed", False)),
+            "passed_tests": passed_tests,
+            "duration_ms": (time.perf_counter() - started) * 1000,
             "results": results
         }
-
@@ -2,30 +2,121 @@ import os
 from dotenv import load_dotenv
 import requests
 import json
+import hashlib
+import threading
+import time
+from scheduler import ModelScheduler, SingleFlight, PRIORITY_INTERACTIVE
+from mock_provider import MockProvider
+from instrumentation import METRICS
 
 load_dotenv()
 
+# Returned by providers when generation fails; callers that store model output should reject it
+FALLBACK_RESPONSE = "I'm sorry, I couldn't generate a response. Please check your API configuration."
+
 # Support multiple AI providers - prioritize free options
-AI_PROVIDER = os.getenv("AI_PROVIDER", "huggingface")  # huggingface, ollama, or google
+AI_PROVIDER = os.getenv("AI_PROVIDER", "huggingface")  # huggingface, ollama, google, or mock
 
 # Hugging Face (Free tier - better models)
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
 HUGGINGFACE_MODEL = os.getenv("HUGGINGFACE_MODEL", "meta-llama/Llama-3.2-3B-Instruct")  # Free and powerful
+HUGGINGFACE_FAST_MODEL = os.getenv("HUGGINGFACE_FAST_MODEL", "meta-llama/Llama-3.2-1B-Instruct")  # Short labelling calls
 
 # Ollama (Local - completely free)
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+OLLAMA_FAST_MODEL = os.getenv("OLLAMA_FAST_MODEL", "llama3.2:1b")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Keep the model loaded between turns
+OLLAMA_SESSION_MAX_CONTEXT = int(os.getenv("OLLAMA_SESSION_MAX_CONTEXT", "3072"))  # Tokens carried over per session
+OLLAMA_SESSION_TTL = int(os.getenv("OLLAMA_SESSION_TTL", "1800"))  # Seconds before an idle session is dropped
 
 # Google Gemini (fallback)
 GENAI_API_KEY = os.getenv("GENAI_API_KEY", "")
+GOOGLE_MODEL = os.getenv("GOOGLE_MODEL", "gemini-1.5-flash")
+GOOGLE_FAST_MODEL = os.getenv("GOOGLE_FAST_MODEL", "gemini-1.5-flash-8b")
+
+# Mock (offline, deterministic - for load and latency testing)
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "200"))
+MOCK_LATENCY_JITTER_MS = float(os.getenv("MOCK_LATENCY_JITTER_MS", "50"))
+MOCK_LATENCY_DISTRIBUTION = os.getenv("MOCK_LATENCY_DISTRIBUTION", "lognormal")  # fixed, uniform, normal, lognormal
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_SEED = int(os.getenv("MOCK_SEED", "0"))
+MOCK_STREAM_CHUNK_CHARS = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "16"))
+
+# Model call scheduling: global in-flight cap and per-provider (requests/sec, burst)
+MODEL_MAX_IN_FLIGHT = int(os.getenv("MODEL_MAX_IN_FLIGHT", "4"))
+PROVIDER_RATE_LIMITS = {
+    "huggingface": (float(os.getenv("HUGGINGFACE_RATE_PER_SEC", "0.5")), float(os.getenv("HUGGINGFACE_BURST", "5"))),
+    "ollama": (float(os.getenv("OLLAMA_RATE_PER_SEC", "10")), float(os.getenv("OLLAMA_BURST", "10"))),
+    "google": (float(os.getenv("GOOGLE_RATE_PER_SEC", "0.25")), float(os.getenv("GOOGLE_BURST", "5"))),
+    "mock": (float(os.getenv("MOCK_RATE_PER_SEC", "1000")), float(os.getenv("MOCK_BURST", "1000"))),
+}
+
+# Per-call-site routing. Each entry may set "provider", "model", "max_tokens" and
+# "temperature"; anything unset uses the default provider/model and the caller's
+# values. A temperature of 0 means greedy decoding (sent as do_sample=false to HF). "model": "fast" picks the small model of whichever provider serves the call.
+FAST_MODELS = {
+    "huggingface": HUGGINGFACE_FAST_MODEL,
+    "ollama": OLLAMA_FAST_MODEL,
+    "google": GOOGLE_FAST_MODEL,
+}
+MODEL_ROUTES = {
+    "classify_topic": {"model": "fast", "max_tokens": 48, "temperature": 0.0},
+    "difficulty": {"model": "fast", "max_tokens": 8, "temperature": 0.0},
+    "tutor_answer": {"max_tokens": 2048},
+}
+# Override or extend from the environment, e.g. MODEL_ROUTES_JSON='{"study_plan": {"provider": "google"}}'
+MODEL_ROUTES.update(json.loads(os.getenv("MODEL_ROUTES_JSON", "{}") or "{}"))
 
 CHROMADB_PATH = './tutor_memory'
 
+# Periodic dump of model call metrics (0 disables)
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "0"))
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", os.path.join(CHROMADB_PATH, "model_metrics.json"))
+
+# Approximate token budgets for conversation context in prompts
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CLASSIFY_CONTEXT_TOKEN_BUDGET = int(os.getenv("CLASSIFY_CONTEXT_TOKEN_BUDGET", "400"))
+
+# Rolling conversation summary: refresh every N turns, capped at this many words
+SUMMARY_EVERY_N_TURNS = int(os.getenv("SUMMARY_EVERY_N_TURNS", "5"))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", "150"))
+
+# Journal for background side effects (replayed after a crash)
+BACKGROUND_JOURNAL_PATH = os.getenv("BACKGROUND_JOURNAL_PATH", os.path.join(CHROMADB_PATH, "background_journal.jsonl"))
+# Rewrite the journal with only unfinished tasks after this many tasks complete
+BACKGROUND_JOURNAL_COMPACT_EVERY = int(os.getenv("BACKGROUND_JOURNAL_COMPACT_EVERY", "200"))
+
+# A new flashcard whose front has the same content words as an existing one
+# (ignoring function words) and shares at least this fraction of character
+# trigrams with it is rejected as a near-duplicate (0 rejects exact matches only)
+FLASHCARD_SIMILARITY_THRESHOLD = float(os.getenv("FLASHCARD_SIMILARITY_THRESHOLD", "0.6"))
+
+# Pre-generated exercises kept ready per (topic, subtopic, difficulty, type),
+# warmed for a student's most recent topics at login (0 disables the pool)
+EXERCISE_POOL_DEPTH = int(os.getenv("EXERCISE_POOL_DEPTH", "3"))
+EXERCISE_POOL_WARM_TOPICS = int(os.getenv("EXERCISE_POOL_WARM_TOPICS", "3"))
+
+# Adaptive exercises aim for this expected success rate when picking a difficulty
+ADAPTIVE_TARGET_SUCCESS = float(os.getenv("ADAPTIVE_TARGET_SUCCESS", "0.65"))
+
+# Share of expected keywords a short answer must cover to count as correct
+SHORT_ANSWER_PASS_COVERAGE = float(os.getenv("SHORT_ANSWER_PASS_COVERAGE", "0.5"))
+
+# Student code runs in child processes: at most this many at once across all
+# submissions, each capped in memory, with output shown back truncated
+CODE_TEST_MAX_WORKERS = int(os.getenv("CODE_TEST_MAX_WORKERS", "4"))
+CODE_MEMORY_LIMIT_MB = int(os.getenv("CODE_MEMORY_LIMIT_MB", "256"))
+CODE_OUTPUT_LIMIT_CHARS = int(os.getenv("CODE_OUTPUT_LIMIT_CHARS", "2000"))
+
 class AIModel:
     """Unified AI model interface supporting multiple providers."""
     
     def __init__(self):
         self.provider = AI_PROVIDER
+        # Ollama context vectors per session (student), reused between turns
+        self._ollama_sessions = {}
+        self._ollama_sessions_lock = threading.Lock()
         self.setup_model()
     
     def setup_model(self):
@@ -34,24 +125,156 @@ class AIModel:
             self.model_type = "huggingface"
         elif self.provider == "ollama":
             self.model_type = "ollama"
+        elif self.provider == "mock":
+            self.mock_model = MockProvider(
+                latency_ms=MOCK_LATENCY_MS,
+                jitter_ms=MOCK_LATENCY_JITTER_MS,
+                distribution=MOCK_LATENCY_DISTRIBUTION,
+                error_rate=MOCK_ERROR_RATE,
+                seed=MOCK_SEED,
+                stream_chunk_chars=MOCK_STREAM_CHUNK_CHARS
+            )
+            self.model_type = "mock"
         elif GENAI_API_KEY:
             import google.generativeai as genai
             genai.configure(api_key=GENAI_API_KEY)
-            self.model = genai.GenerativeModel("gemini-1.5-flash")
+            self.model = genai.GenerativeModel(GOOGLE_MODEL)
             self.model_type = "google"
         else:
             self.model_type = "huggingface"  # Default to Hugging Face
     
-    def generate_content(self, prompt, system_prompt=None, max_tokens=2048, temperature=0.7, image_data=None):
-        """Generate content using the configured AI provider."""
-        if self.model_type == "huggingface":
-            return self._huggingface_generate(prompt, system_prompt, max_tokens, temperature, image_data)
-        elif self.model_type == "ollama":
-            return self._ollama_generate(prompt, system_prompt, max_tokens, temperature, image_data)
+    def generate_content(self, prompt, system_prompt=None, max_tokens=2048, temperature=0.7, image_data=None, priority=PRIORITY_INTERACTIVE, session_id=None, call_site="unknown", session_prompt=None):
+        """Generate content using the configured AI provider.
+
+        Concurrent identical requests share one upstream call, and calls are
+        admitted by the shared scheduler in priority order, so interactive
+        requests go ahead of batch generation. ``session_id`` lets providers
+        that support it (Ollama) carry state over between turns; while they
+        hold the session's earlier turns they are sent ``session_prompt``
+        instead of ``prompt``, which must be self-contained because fallback
+        providers and expired sessions get it. Latency, sizes, provider and
+        fallbacks are recorded under ``call_site``.
+        """
+        provider, model, max_tokens, temperature = self._route(call_site, max_tokens, temperature)
+        key = self._request_key(prompt, system_prompt, max_tokens, temperature, image_data, session_id, provider, model, session_prompt)
+        with METRICS.track(call_site, provider, f"{system_prompt or ''}{prompt}") as call:
+            call["result"] = SINGLE_FLIGHT.do(
+                key,
+                lambda: self._scheduled_generate(prompt, system_prompt, max_tokens, temperature, image_data, priority, session_id, provider, model, session_prompt)
+            )
+            return call["result"]
+    
+    def _route(self, call_site, max_tokens, temperature):
+        """Resolve provider, model, max_tokens and temperature for a call site from MODEL_ROUTES."""
+        route = MODEL_ROUTES.get(call_site, {})
+        provider = route.get("provider") or self.model_type
+        if not self._provider_available(provider):
+            provider = self.model_type
+        model = route.get("model")
+        if model == "fast":
+            model = FAST_MODELS.get(provider)
+        return provider, model, route.get("max_tokens", max_tokens), route.get("temperature", temperature)
+    
+    def _provider_available(self, provider):
+        if provider == self.model_type:
+            return True
+        if provider == "huggingface":
+            return bool(HUGGINGFACE_API_KEY)
+        if provider == "google":
+            return bool(GENAI_API_KEY)
+        # Ollama needs a local server and mock is only for testing; use them only as the main provider
+        return False
+    
+    def _request_key(self, prompt, system_prompt, max_tokens, temperature, image_data, session_id=None, provider=None, model=None, session_prompt=None):
+        """Identity of a request for coalescing."""
+        payload = json.dumps([provider or self.model_type, model, prompt, system_prompt, max_tokens, temperature, image_data, session_id, session_prompt])
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _scheduled_generate(self, prompt, system_prompt, max_tokens, temperature, image_data, priority, session_id=None, provider=None, model=None, session_prompt=None):
+        provider = provider or self.model_type
+        with SCHEDULER.slot(provider, priority):
+            if provider == "huggingface":
+                return self._huggingface_generate(prompt, system_prompt, max_tokens, temperature, image_data, model)
+            elif provider == "ollama":
+                return self._ollama_generate(prompt, system_prompt, max_tokens, temperature, image_data, session_id, model, session_prompt)
+            elif provider == "mock":
+                return self._mock_generate(prompt, system_prompt, max_tokens)
+            else:
+                return self._google_generate(prompt, system_prompt, image_data, model, max_tokens, temperature)
+    
+    def stream_content(self, prompt, system_prompt=None, max_tokens=2048, temperature=0.7, image_data=None, priority=PRIORITY_INTERACTIVE, call_site="unknown"):
+        """Yield the response in chunks. Ollama and the mock provider stream; the others yield it whole."""
+        provider, model, max_tokens, temperature = self._route(call_site, max_tokens, temperature)
+        if provider == "ollama":
+            yield from self._ollama_stream(prompt, system_prompt, max_tokens, temperature, image_data, priority, call_site, model)
+        elif self.model_type == "mock":
+            with METRICS.track(call_site, self.model_type, f"{system_prompt or ''}{prompt}") as call:
+                with SCHEDULER.slot(self.model_type, priority):
+                    chunks = []
+                    try:
+                        for chunk in self.mock_model.stream(prompt, system_prompt, max_tokens):
+                            chunks.append(chunk)
+                            yield chunk
+                    except Exception as e:
+                        print(f"Mock provider error: {e}")
+                        METRICS.note_error()
+                        yield FALLBACK_RESPONSE
+                    call["result"] = "".join(chunks)
         else:
-            return self._google_generate(prompt, system_prompt, image_data)
+            yield self.generate_content(prompt, system_prompt, max_tokens, temperature, image_data, priority, call_site=call_site)
+    
+    def _ollama_stream(self, prompt, system_prompt, max_tokens, temperature, image_data, priority, call_site, model=None):
+        """Stream from Ollama (one JSON object per line); falls back to Google if nothing arrived."""
+        full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        if image_data:
+            full_prompt = f"[Note: User has provided an image with their question. Please respond as if you can see the image and describe what might be in it based on the question context.]\n\n{full_prompt}"
+        payload = {
+            "model": model or OLLAMA_MODEL,
+            "prompt": full_prompt,
+            "stream": True,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        with METRICS.track(call_site, "ollama", f"{system_prompt or ''}{prompt}") as call:
+            with SCHEDULER.slot("ollama", priority):
+                chunks = []
+                try:
+                    with requests.post(f"{OLLAMA_BASE_URL}/api/generate", json=payload, stream=True, timeout=120) as response:
+                        response.raise_for_status()
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            if data.get("response"):
+                                chunks.append(data["response"])
+                                yield data["response"]
+                            if data.get("done"):
+                                break
+                except Exception as e:
+                    print(f"Ollama error: {e}")
+                    if not chunks:
+                        chunks.append(self._fallback_to_google(prompt, system_prompt, image_data))
+                        yield chunks[-1]
+                call["result"] = "".join(chunks)
+    
+    def _mock_generate(self, prompt, system_prompt, max_tokens):
+        """Generate using the offline mock provider (no fallback, errors are part of the simulation)."""
+        try:
+            return self.mock_model.generate(prompt, system_prompt, max_tokens)
+        except Exception as e:
+            print(f"Mock provider error: {e}")
+            METRICS.note_error()
+            return FALLBACK_RESPONSE
+    
+    def _fallback_to_google(self, prompt, system_prompt, image_data=None):
+        """Fall back to Google Gemini, recording the fallback for the current call."""
+        METRICS.note_fallback("google")
+        return self._google_generate(prompt, system_prompt, image_data)
     
-    def _huggingface_generate(self, prompt, system_prompt, max_tokens, temperature, image_data=None):
+    def _huggingface_generate(self, prompt, system_prompt, max_tokens, temperature, image_data=None, model=None):
         """Generate using Hugging Face Inference API."""
         try:
             headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
@@ -69,9 +292,13 @@ class AIModel:
                     "return_full_text": False
                 }
             }
+            if temperature is not None and temperature <= 0:
+                # TGI rejects temperature <= 0 (422); ask for greedy decoding instead
+                del payload["parameters"]["temperature"]
+                payload["parameters"]["do_sample"] = False
             
             response = requests.post(
-                f"https://api-inference.huggingface.co/models/{HUGGINGFACE_MODEL}",
+                f"https://api-inference.huggingface.co/models/{model or HUGGINGFACE_MODEL}",
                 headers=headers,
                 json=payload,
                 timeout=60
@@ -83,30 +310,63 @@ class AIModel:
                     return result[0].get("generated_text", "")
                 return str(result)
             else:
+                if response.status_code == 429:
+                    SCHEDULER.penalize("huggingface", float(response.headers.get("Retry-After", 5) or 5))
                 # Fallback to Google if Hugging Face fails
-                return self._google_generate(prompt, system_prompt, image_data)
+                return self._fallback_to_google(prompt, system_prompt, image_data)
         except Exception as e:
             print(f"Hugging Face error: {e}, falling back to Google")
-            return self._google_generate(prompt, system_prompt, image_data)
+            return self._fallback_to_google(prompt, system_prompt, image_data)
     
-    def _ollama_generate(self, prompt, system_prompt, max_tokens, temperature, image_data=None):
-        """Generate using local Ollama."""
+    def _get_ollama_session(self, session_id):
+        with self._ollama_sessions_lock:
+            session = self._ollama_sessions.get(session_id)
+            if session and time.time() - session["updated"] > OLLAMA_SESSION_TTL:
+                del self._ollama_sessions[session_id]
+                return None
+            return session
+    
+    def _update_ollama_session(self, session_id, context):
+        with self._ollama_sessions_lock:
+            if context and len(context) <= OLLAMA_SESSION_MAX_CONTEXT:
+                self._ollama_sessions[session_id] = {"context": context, "updated": time.time()}
+            else:
+                # Too long to carry over (or missing): next turn starts fresh
+                self._ollama_sessions.pop(session_id, None)
+    
+    def _ollama_generate(self, prompt, system_prompt, max_tokens, temperature, image_data=None, session_id=None, model=None, session_prompt=None):
+        """Generate using local Ollama.
+
+        With a ``session_id`` the context vector returned by Ollama is sent
+        back on the next turn, so the server only evaluates the new prompt
+        instead of re-processing the system prompt and history. The model is
+        pinned in memory with ``keep_alive``.
+        """
         try:
-            full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+            session = self._get_ollama_session(session_id) if session_id else None
+            
+            if session:
+                # System prompt and earlier turns are already in the context
+                full_prompt = session_prompt if session_prompt is not None else prompt
+            else:
+                full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
             
             # If image is provided, add note to prompt (Ollama text models don't support images directly)
             if image_data:
                 full_prompt = f"[Note: User has provided an image with their question. Please respond as if you can see the image and describe what might be in it based on the question context.]\n\n{full_prompt}"
             
             payload = {
-                "model": OLLAMA_MODEL,
+                "model": model or OLLAMA_MODEL,
                 "prompt": full_prompt,
                 "stream": False,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
                 "options": {
                     "temperature": temperature,
                     "num_predict": max_tokens
                 }
             }
+            if session:
+                payload["context"] = session["context"]
             
             response = requests.post(
                 f"{OLLAMA_BASE_URL}/api/generate",
@@ -116,20 +376,41 @@ class AIModel:
             
             if response.status_code == 200:
                 result = response.json()
+                if session_id:
+                    self._update_ollama_session(session_id, result.get("context"))
                 return result.get("response", "")
             else:
-                return self._google_generate(prompt, system_prompt, image_data)
+                if session_id:
+                    self._update_ollama_session(session_id, None)
+                return self._fallback_to_google(prompt, system_prompt, image_data)
         except Exception as e:
             print(f"Ollama error: {e}, falling back to Google")
-            return self._google_generate(prompt, system_prompt, image_data)
+            if session_id:
+                self._update_ollama_session(session_id, None)
+            return self._fallback_to_google(prompt, system_prompt, image_data)
     
-    def _google_generate(self, prompt, system_prompt, image_data=None):
+    def _google_generate(self, prompt, system_prompt, image_data=None, model=None, max_tokens=None, temperature=None):
         """Generate using Google Gemini (supports images)."""
         try:
             import google.generativeai as genai
             if not hasattr(self, 'model'):
                 genai.configure(api_key=GENAI_API_KEY)
-                self.model = genai.GenerativeModel("gemini-1.5-flash")
+                self.model = genai.GenerativeModel(GOOGLE_MODEL)
+            
+            gemini = self.model
+            if model and model != GOOGLE_MODEL:
+                # Routed calls may use another Gemini model
+                if not hasattr(self, '_google_models'):
+                    self._google_models = {}
+                if model not in self._google_models:
+                    self._google_models[model] = genai.GenerativeModel(model)
+                gemini = self._google_models[model]
+            
+            generation_config = {}
+            if max_tokens is not None:
+                generation_config["max_output_tokens"] = max_tokens
+            if temperature is not None:
+                generation_config["temperature"] = temperature
             
             full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
             
@@ -144,15 +425,24 @@ class AIModel:
                 image = Image.open(io.BytesIO(image_bytes))
                 
                 # Send both image and text to Gemini
-                response = self.model.generate_content([image, full_prompt])
+                response = gemini.generate_content([image, full_prompt], generation_config=generation_config or None)
             else:
                 # Text only
-                response = self.model.generate_content(full_prompt)
+                response = gemini.generate_content(full_prompt, generation_config=generation_config or None)
             
             return response.candidates[0].content.parts[0].text.strip()
         except Exception as e:
             print(f"Google Gemini error: {e}")
-            return "I'm sorry, I couldn't generate a response. Please check your API configuration."
+            METRICS.note_error()
+            return FALLBACK_RESPONSE
+
+# Shared scheduler for all model calls in this process
+SCHEDULER = ModelScheduler(PROVIDER_RATE_LIMITS, MODEL_MAX_IN_FLIGHT)
+SINGLE_FLIGHT = SingleFlight()
+
+METRICS.add_source("scheduler", SCHEDULER.metrics)
+METRICS.add_source("single_flight", SINGLE_FLIGHT.metrics)
+METRICS.start_periodic_dump(METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL)
 
 # Create global model instance
 MODEL = AIModel()
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Token-budgeted conversation context assembly for prompts."""
+from typing import Dict, List, Optional, Tuple
+
+from config import CONTEXT_TOKEN_BUDGET
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def format_turn(entry: Dict) -> Optional[str]:
+    """Format a stored conversation entry as a Student/AI Tutor exchange."""
+    if not isinstance(entry, dict):
+        return None
+    if "question" in entry and "response" in entry:
+        return f"Student: {entry['question']}\nAI Tutor: {entry['response']}"
+    if "user" in entry and "assistant" in entry:
+        return f"Student: {entry['user']}\nAI Tutor: {entry['assistant']}"
+    return None
+
+
+def _turn_key(entry: Dict) -> Tuple:
+    """Identity of a stored turn; the same turn may come from several sources."""
+    return (
+        entry.get("timestamp"),
+        entry.get("question", entry.get("user")),
+        entry.get("response", entry.get("assistant"))
+    )
+
+
+class ContextAssembler:
+    """
+    Build a deduplicated conversation context that fits a token budget.
+
+    The most recent turns are considered first (newest to oldest), followed by
+    keyword-relevant turns. Turns that no longer fit are skipped so a single
+    long answer cannot crowd out everything else. Selected turns are emitted
+    in chronological order.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, max_recent: int = 5, max_relevant: int = 3):
+        self.token_budget = token_budget
+        self.max_recent = max_recent
+        self.max_relevant = max_relevant
+
+    def select(self, recent: List[Dict], relevant: Optional[List[Dict]] = None) -> List[Dict]:
+        """Pick the turns to include, in chronological order."""
+        recent = recent[-self.max_recent:] if self.max_recent else []
+        relevant = (relevant or [])[-self.max_relevant:] if self.max_relevant else []
+
+        # Position in the stored history decides the final ordering
+        order = {}
+        for position, entry in enumerate(recent):
+            order.setdefault(_turn_key(entry), (1, position))
+        for position, entry in enumerate(relevant):
+            order.setdefault(_turn_key(entry), (0, position))
+
+        candidates = list(reversed(recent)) + list(reversed(relevant))
+
+        seen = set()
+        selected = []
+        remaining = self.token_budget
+        for entry in candidates:
+            if not isinstance(entry, dict):
+                continue
+            key = _turn_key(entry)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            text = format_turn(entry)
+            if not text:
+                continue
+            cost = estimate_tokens(text) + 1  # Separator newline
+            if cost > remaining:
+                continue
+
+            selected.append(entry)
+            remaining -= cost
+
+        # Relevant (older) turns first, then the recent window, each in stored order
+        selected.sort(key=lambda e: order[_turn_key(e)])
+        return selected
+
+    def build(self, recent: List[Dict], relevant: Optional[List[Dict]] = None) -> str:
+        """Return the formatted context string for a prompt."""
+        return "\n".join(format_turn(entry) for entry in self.select(recent, relevant))
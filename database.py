@@ -9,6 +9,12 @@ class Database:
         self.progress_db = self.client.get_or_create_collection("student_progress")
         # Add metadata collection for better organization
         self.metadata_db = self.client.get_or_create_collection("metadata")
+        # One document per flashcard so a review rewrites only that card
+        self.flashcard_db = self.client.get_or_create_collection("flashcards")
+        # Exercise library shared by all students, one document per exercise
+        self.exercise_db = self.client.get_or_create_collection("exercise_library")
+        # Append-only exercise/quiz attempts, one document per attempt
+        self.attempt_db = self.client.get_or_create_collection("quiz_attempts")
 
     def get_progress(self, student_id):
         """Retrieve stored progress data for a student."""
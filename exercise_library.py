@@ -0,0 +1,194 @@
+"""Shared exercise library reused across students."""
+import json
+import threading
+from typing import Dict, List, Optional
+
+from database import Database
+from exercise_pool import pool_key
+from utils import generate_id, normalize_text
+
+db = Database("./tutor_memory")
+
+
+def library_key(topic: str, subtopic: str, difficulty: str, exercise_type: str) -> str:
+    """Index key for (topic, subtopic, difficulty, type), normalized like the pool's."""
+    return "|".join(pool_key(topic, subtopic, difficulty, exercise_type))
+
+
+class ExerciseLibrary:
+    """
+    Generated exercises shared by all students.
+
+    Each exercise is one document in ``exercise_db`` tagged with its library
+    key and an ordinal within that key, along with usage and quality counters.
+    Which exercises a student has seen is a bitmap per key (bit ``ordinal``),
+    stored as a hex string in one document per student, so ``draw`` can hand
+    out exercises the student has not seen yet without a model call.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # library key -> entries ({"exercise", "stats"}) in ordinal order
+        self._entries: Dict[str, List[Dict]] = {}
+        self._ids: Dict[str, Dict] = {}
+        self._seen: Dict[str, Dict[str, int]] = {}
+
+    def draw(self, student_id: str, topic: str, subtopic: str, difficulty: str,
+             exercise_type: str, count: int = 1) -> List[Dict]:
+        """
+        Up to ``count`` exercises the student has not seen, best rated and
+        least used first. They are marked seen and their usage is counted.
+        """
+        key = library_key(topic, subtopic, difficulty, exercise_type)
+        with self._lock:
+            entries = self._load_key(key)
+            seen = self._load_seen(student_id).get(key, 0)
+            unseen = [entry for entry in entries if not seen >> entry["stats"]["ordinal"] & 1]
+            unseen.sort(key=lambda entry: (-self._quality(entry), entry["stats"]["uses"]))
+            drawn = unseen[:count]
+            for entry in drawn:
+                entry["stats"]["uses"] += 1
+            if drawn:
+                self._mark_seen(student_id, key, [entry["stats"]["ordinal"] for entry in drawn])
+                self._save_entries(key, drawn)
+            return [self._serve(entry) for entry in drawn]
+
+    def add(self, student_id: Optional[str], exercises: List[Dict]) -> List[Dict]:
+        """
+        Store newly generated exercises (duplicates of existing questions are
+        not stored twice). If ``student_id`` is given they count as served to
+        that student, and questions the student has already seen (e.g. a
+        regenerated duplicate) are stored but left out of the result, so the
+        caller can ask for replacements. Returns the exercises to serve with
+        their library ids set.
+        """
+        served = []
+        with self._lock:
+            added: Dict[str, List[Dict]] = {}
+            ordinals: Dict[str, List[int]] = {}
+            seen = self._load_seen(student_id) if student_id is not None else {}
+            for exercise in exercises:
+                key = library_key(exercise.get("topic", ""), exercise.get("subtopic", ""),
+                                  exercise.get("difficulty", ""), exercise.get("type", ""))
+                exercise_id = generate_id(f"{key}|{normalize_text(exercise.get('question', ''))}")
+                entries = self._load_key(key)
+                entry = self._ids.get(exercise_id)
+                if entry is None:
+                    clean = {k: v for k, v in exercise.items() if k not in ("id", "library_key")}
+                    entry = {
+                        "exercise": clean,
+                        "stats": {"id": exercise_id, "key": key, "ordinal": len(entries),
+                                  "uses": 0, "attempts": 0, "correct": 0, "up": 0, "down": 0}
+                    }
+                    entries.append(entry)
+                    self._ids[exercise_id] = entry
+                added.setdefault(key, []).append(entry)
+                if student_id is not None:
+                    ordinal = entry["stats"]["ordinal"]
+                    if seen.get(key, 0) >> ordinal & 1 or ordinal in ordinals.get(key, ()):
+                        continue
+                    entry["stats"]["uses"] += 1
+                    ordinals.setdefault(key, []).append(ordinal)
+                served.append(self._serve(entry))
+
+            for key, entries in added.items():
+                self._save_entries(key, entries)
+                if key in ordinals:
+                    self._mark_seen(student_id, key, ordinals[key])
+        return served
+
+    def seen_questions(self, student_id: str, topic: str, subtopic: str, difficulty: str,
+                       exercise_type: str, limit: int = 20) -> List[str]:
+        """Questions of the student's most recently added seen exercises for a key."""
+        key = library_key(topic, subtopic, difficulty, exercise_type)
+        with self._lock:
+            seen = self._load_seen(student_id).get(key, 0)
+            questions = [entry["exercise"].get("question", "") for entry in self._load_key(key)
+                         if seen >> entry["stats"]["ordinal"] & 1]
+        return questions[-limit:] if limit > 0 else []
+
+    def record_attempt(self, exercise_id: str, correct: bool):
+        """Count an answer to a library exercise."""
+        self._update_stats(exercise_id, attempts=1, correct=1 if correct else 0)
+
+    def rate(self, exercise_id: str, helpful: bool):
+        """Record a student's quality vote for a library exercise."""
+        self._update_stats(exercise_id, up=1 if helpful else 0, down=0 if helpful else 1)
+
+    def _update_stats(self, exercise_id: str, **increments):
+        with self._lock:
+            entry = self._ids.get(exercise_id)
+            if entry is None:
+                return
+            for name, amount in increments.items():
+                entry["stats"][name] += amount
+            self._save_entries(entry["stats"]["key"], [entry])
+
+    @staticmethod
+    def _quality(entry: Dict) -> float:
+        """Smoothed share of helpful votes (0.5 with no votes)."""
+        stats = entry["stats"]
+        return (stats["up"] + 1) / (stats["up"] + stats["down"] + 2)
+
+    @staticmethod
+    def _serve(entry: Dict) -> Dict:
+        exercise = dict(entry["exercise"])
+        exercise["id"] = entry["stats"]["id"]
+        exercise["library_key"] = entry["stats"]["key"]
+        return exercise
+
+    def _load_key(self, key: str) -> List[Dict]:
+        """Entries for a key, read from the database on first use."""
+        if key not in self._entries:
+            entries = []
+            try:
+                data = db.exercise_db.get(where={"library_key": key})
+                if data and data.get("documents"):
+                    entries = [json.loads(doc) for doc in data["documents"]]
+            except Exception as e:
+                print(f"Error loading exercise library: {e}")
+            entries.sort(key=lambda entry: entry["stats"]["ordinal"])
+            self._entries[key] = entries
+            for entry in entries:
+                self._ids[entry["stats"]["id"]] = entry
+        return self._entries[key]
+
+    def _save_entries(self, key: str, entries: List[Dict]):
+        try:
+            db.exercise_db.upsert(
+                documents=[json.dumps(entry) for entry in entries],
+                ids=[entry["stats"]["id"] for entry in entries],
+                metadatas=[{"library_key": key} for _ in entries]
+            )
+        except Exception as e:
+            print(f"Error saving exercise library: {e}")
+
+    def _load_seen(self, student_id: str) -> Dict[str, int]:
+        if student_id not in self._seen:
+            seen = {}
+            try:
+                data = db.progress_db.get(ids=[f"{student_id}_exercises_seen"])
+                if data and data.get("documents"):
+                    seen = {key: int(bits, 16) for key, bits in json.loads(data["documents"][0]).items()}
+            except Exception as e:
+                print(f"Error loading seen exercises: {e}")
+            self._seen[student_id] = seen
+        return self._seen[student_id]
+
+    def _mark_seen(self, student_id: str, key: str, ordinals: List[int]):
+        seen = self._load_seen(student_id)
+        bits = seen.get(key, 0)
+        for ordinal in ordinals:
+            bits |= 1 << ordinal
+        seen[key] = bits
+        try:
+            db.progress_db.upsert(
+                documents=[json.dumps({k: format(v, "x") for k, v in seen.items()})],
+                ids=[f"{student_id}_exercises_seen"]
+            )
+        except Exception as e:
+            print(f"Error saving seen exercises: {e}")
+
+
+# Shared library for the process
+EXERCISE_LIBRARY = ExerciseLibrary()
@@ -0,0 +1,93 @@
+"""Pool of pre-generated exercises, topped up in the background."""
+import queue
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+PoolKey = Tuple[str, str, str, str]
+
+
+def pool_key(topic: str, subtopic: str, difficulty: str, exercise_type: str) -> PoolKey:
+    """Normalized (topic, subtopic, difficulty, type) key."""
+    return tuple(" ".join(str(part).split()).casefold() for part in (topic, subtopic, difficulty, exercise_type))
+
+
+class ExercisePool:
+    """
+    Ready-to-serve exercises per (topic, subtopic, difficulty, type).
+
+    ``take`` pops an exercise without blocking; every take (hit or miss) asks a
+    background worker to top that key back up to ``depth`` by calling
+    ``fill(topic, subtopic, difficulty, exercise_type, count)``. Refills run on
+    their own thread rather than the shared background queue so slow batch
+    generations never delay per-turn side effects, and they are not journaled:
+    a lost refill only costs a cold miss.
+    """
+
+    def __init__(self, fill: Callable[[str, str, str, str, int], List[Dict]], depth: int = 3):
+        self.fill = fill
+        self.depth = depth
+        self._pools: Dict[PoolKey, Deque[Dict]] = {}
+        self._pending: Set[PoolKey] = set()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[PoolKey, Tuple[str, str, str, str]]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    def take(self, topic: str, subtopic: str, difficulty: str, exercise_type: str) -> Optional[Dict]:
+        """Pop a ready exercise (None on a miss) and schedule a refill."""
+        key = pool_key(topic, subtopic, difficulty, exercise_type)
+        with self._lock:
+            pool = self._pools.get(key)
+            exercise = pool.popleft() if pool else None
+            if exercise is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self.request_refill(topic, subtopic, difficulty, exercise_type)
+        return exercise
+
+    def request_refill(self, topic: str, subtopic: str, difficulty: str, exercise_type: str):
+        """Top a key up to ``depth`` in the background (no-op if full or already queued)."""
+        if self.depth <= 0:
+            return
+        key = pool_key(topic, subtopic, difficulty, exercise_type)
+        with self._lock:
+            if key in self._pending or len(self._pools.get(key, ())) >= self.depth:
+                return
+            self._pending.add(key)
+        self._ensure_worker()
+        self._queue.put((key, (topic, subtopic, difficulty, exercise_type)))
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "keys": len(self._pools),
+                "ready": sum(len(pool) for pool in self._pools.values()),
+                "pending_refills": len(self._pending)
+            }
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="exercise-pool", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            key, args = self._queue.get()
+            try:
+                with self._lock:
+                    missing = self.depth - len(self._pools.get(key, ()))
+                if missing > 0:
+                    exercises = self.fill(*args, missing)
+                    with self._lock:
+                        self._pools.setdefault(key, deque()).extend(exercises)
+            except Exception as e:
+                print(f"Error refilling exercise pool: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._queue.task_done()
@@ -1,20 +1,87 @@
 """Interactive exercises and quiz system."""
-import json
 import random
-from typing import List, Dict, Any
-from config import MODEL
+from typing import List, Dict, Any, Optional, Tuple
+from config import MODEL, EXERCISE_POOL_DEPTH, EXERCISE_POOL_WARM_TOPICS
+from scheduler import PRIORITY_INTERACTIVE, PRIORITY_BATCH
 from database import Database
+from instrumentation import METRICS
+from exercise_pool import ExercisePool
+from exercise_library import EXERCISE_LIBRARY
+from attempt_log import get_attempt_log
+from adaptive import get_selector
+from grading import grade_batch
+from code_executor import CodeExecutor
+from schemas import EXERCISE_SCHEMAS, repair, complete
 
 db = Database("./tutor_memory")
 
+# Model calls spent on exercises the student has not seen (the first call plus
+# one retry); the prompt lists questions they have seen so repeats are rare
+REPLACEMENT_ATTEMPTS = 2
+
+# Item format per exercise type, used when asking for several items at once
+EXERCISE_FORMATS = {
+    "multiple_choice": """{
+    "question": "The question text",
+    "options": ["option1", "option2", "option3", "option4"],
+    "correct_answer": 0,
+    "explanation": "Why this answer is correct",
+    "hints": ["hint1", "hint2"]
+}""",
+    "coding": """{
+    "question": "The problem description",
+    "starter_code": "def function_name():\\n    # Your code here",
+    "test_cases": [{"input": "...", "expected_output": "..."}],
+    "hints": ["hint1", "hint2"],
+    "solution": "The complete solution code"
+}""",
+    "short_answer": """{
+    "question": "The question text",
+    "expected_keywords": ["keyword1", "keyword2"],
+    "explanation": "Detailed explanation",
+    "hints": ["hint1", "hint2"]
+}"""
+}
+
 class ExerciseGenerator:
     """Generate interactive exercises, quizzes, and practice problems."""
     
     def __init__(self, student_id: str):
         self.student_id = student_id
+        self.attempt_log = get_attempt_log(student_id)
+    
+    def generate_exercise(self, topic: str, subtopic: str, difficulty: str, exercise_type: str = "multiple_choice", priority: int = PRIORITY_INTERACTIVE) -> Dict:
+        """
+        Get an exercise for a topic and difficulty: one the student has not seen
+        from the shared library, else one from the pre-generated pool, else a
+        newly generated one that is asked not to repeat questions they have seen.
+        New exercises are added to the library; a repeat is replaced. If
+        generation fails a placeholder without an ``id`` is returned, and
+        answers to it are not recorded.
+        """
+        drawn = EXERCISE_LIBRARY.draw(self.student_id, topic, subtopic, difficulty, exercise_type)
+        if drawn:
+            return drawn[0]
+        
+        exclude = EXERCISE_LIBRARY.seen_questions(self.student_id, topic, subtopic, difficulty, exercise_type)
+        calls = 0
+        while calls < REPLACEMENT_ATTEMPTS:
+            exercise = EXERCISE_POOL.take(topic, subtopic, difficulty, exercise_type)
+            if exercise is None:
+                exercise = self._generate_new_exercise(topic, subtopic, difficulty, exercise_type, priority, exclude)
+                calls += 1
+            if not _is_valid_exercise(exercise, exercise_type):
+                # Placeholders are served as they are, never stored
+                return exercise
+            served = EXERCISE_LIBRARY.add(self.student_id, [exercise])
+            if served:
+                return served[0]
+            exclude.append(exercise["question"])
+        return _get_default_exercise(topic, subtopic, difficulty, exercise_type)
     
-    def generate_exercise(self, topic: str, subtopic: str, difficulty: str, exercise_type: str = "multiple_choice") -> Dict:
-        """Generate an exercise based on topic and difficulty."""
+    def _generate_new_exercise(self, topic: str, subtopic: str, difficulty: str, exercise_type: str, priority: int,
+                               exclude: List[str] = ()) -> Dict:
+        """Generate an exercise with the model, avoiding the ``exclude`` questions."""
         system_prompt = """You are an expert educational content creator. Generate engaging, educational exercises that help students learn effectively."""
         
         prompt = f"""Create a {exercise_type} exercise about {topic} - {subtopic} at {difficulty} difficulty level.
@@ -44,14 +111,20 @@ For short answer questions, return:
     "explanation": "Detailed explanation",
     "hints": ["hint1", "hint2"]
 }}
-
+{_exclusion_text(exclude)}
 Now generate a {exercise_type} exercise about {topic} - {subtopic} at {difficulty} level:"""
         
         try:
-            response = MODEL.generate_content(prompt, system_prompt=system_prompt)
+            response = MODEL.generate_content(prompt, system_prompt=system_prompt, priority=priority, call_site="exercise")
             if isinstance(response, str):
                 from utils import extract_json
-                exercise = extract_json(response)
+                exercise = extract_json(response, dict)
+                schema = EXERCISE_SCHEMAS.get(exercise_type, EXERCISE_SCHEMAS["multiple_choice"])
+                context = f"A {exercise_type} exercise about {topic} - {subtopic} at {difficulty} difficulty level."
+                exercise, missing = complete(exercise, schema, context, "exercise", priority)
+                if missing:
+                    METRICS.record_parse_failure("exercise")
+                    return _get_default_exercise(topic, subtopic, difficulty, exercise_type)
                 exercise["type"] = exercise_type
                 exercise["topic"] = topic
                 exercise["subtopic"] = subtopic
@@ -60,88 +133,255 @@ Now generate a {exercise_type} exercise about {topic} - {subtopic} at {difficult
         except Exception as e:
             print(f"Error generating exercise: {e}")
         
-        return self._get_default_exercise(topic, subtopic, difficulty, exercise_type)
+        return _get_default_exercise(topic, subtopic, difficulty, exercise_type)
+    
+    def generate_exercises(self, topic: str, subtopic: str, difficulty: str, exercise_type: str = "multiple_choice",
+                           count: int = 5, priority: int = PRIORITY_BATCH, max_retries: int = 1,
+                           fill_defaults: bool = True, exclude: List[str] = ()) -> List[Dict]:
+        """Generate several exercises in one model call (see ``generate_exercise_batch``)."""
+        return generate_exercise_batch(topic, subtopic, difficulty, exercise_type, count, priority, max_retries,
+                                       fill_defaults, exclude)
     
-    def _get_default_exercise(self, topic: str, subtopic: str, difficulty: str, exercise_type: str) -> Dict:
-        """Return a default exercise if generation fails."""
-        return {
-            "type": exercise_type,
-            "question": f"Explain {subtopic} in {topic}.",
-            "topic": topic,
-            "subtopic": subtopic,
-            "difficulty": difficulty,
-            "options": ["Option A", "Option B", "Option C", "Option D"],
-            "correct_answer": 0,
-            "explanation": "This is a placeholder exercise."
-        }
+    def choose_next(self, topic: str) -> Tuple[str, str]:
+        """Adaptive (subtopic, difficulty) for the student's next exercise on a topic."""
+        return get_selector(self.student_id).choose(topic)
+    
+    def warm_pool(self, exercise_type: str = "multiple_choice"):
+        """Queue background generation for the student's most recent topics at their adaptive level."""
+        progress = db.get_progress(self.student_id) or {}
+        recent = [topic for topic, _ in progress.get("recent_topics", [])]
+        if not recent:
+            recent = list(progress.get("topics_covered", {}))[::-1]
+        
+        topics = []
+        for topic in recent:
+            if topic not in topics:
+                topics.append(topic)
+        for topic in topics[:EXERCISE_POOL_WARM_TOPICS]:
+            subtopic, difficulty = self.choose_next(topic)
+            EXERCISE_POOL.request_refill(topic, subtopic, difficulty, exercise_type)
     
     def generate_quiz(self, topic: str, num_questions: int = 5) -> List[Dict]:
-        """Generate a quiz with multiple questions."""
-        quiz = []
-        for i in range(num_questions):
-            exercise = self.generate_exercise(topic, "General", "Intermediate", "multiple_choice")
+        """
+        Generate a quiz at the student's adaptive subtopic and difficulty, reusing
+        library questions they have not seen and generating the rest in one batch
+        that is told which questions they have already seen. Questions that could
+        not be generated are left out rather than padded with placeholders, so the
+        quiz can be shorter than ``num_questions`` (or empty).
+        """
+        subtopic, difficulty = self.choose_next(topic)
+        exercise_type = "multiple_choice"
+        quiz = EXERCISE_LIBRARY.draw(self.student_id, topic, subtopic, difficulty, exercise_type, num_questions)
+        exclude = EXERCISE_LIBRARY.seen_questions(self.student_id, topic, subtopic, difficulty, exercise_type)
+        attempts = 0
+        while len(quiz) < num_questions and attempts < REPLACEMENT_ATTEMPTS:
+            # Regenerated questions the student has already seen are left out and replaced
+            fresh = self.generate_exercises(topic, subtopic, difficulty, exercise_type, num_questions - len(quiz),
+                                            priority=PRIORITY_BATCH, fill_defaults=False,
+                                            exclude=exclude + [exercise["question"] for exercise in quiz])
+            quiz += EXERCISE_LIBRARY.add(self.student_id, fresh)
+            exclude += [exercise["question"] for exercise in fresh]
+            attempts += 1
+        for i, exercise in enumerate(quiz):
             exercise["question_number"] = i + 1
-            quiz.append(exercise)
         return quiz
     
     def check_answer(self, exercise: Dict, user_answer: Any) -> Dict:
         """Check if user's answer is correct."""
-        exercise_type = exercise.get("type", "multiple_choice")
-        
-        if exercise_type == "multiple_choice":
-            correct = user_answer == exercise.get("correct_answer")
-        elif exercise_type == "short_answer":
-            # Check if answer contains expected keywords
-            answer_lower = str(user_answer).lower()
-            expected = [kw.lower() for kw in exercise.get("expected_keywords", [])]
-            correct = any(kw in answer_lower for kw in expected)
-        elif exercise_type == "coding":
-            # For coding, would need to execute code (implemented separately)
-            correct = False  # Placeholder
-        else:
-            correct = False
-        
-        result = {
-            "correct": correct,
-            "explanation": exercise.get("explanation", ""),
-            "user_answer": user_answer,
-            "correct_answer": exercise.get("correct_answer") if exercise_type == "multiple_choice" else exercise.get("expected_keywords", [])
-        }
-        
-        # Save quiz attempt
-        self._save_quiz_attempt(exercise, user_answer, correct)
-        
-        return result
+        return self.check_answers([(exercise, user_answer)])[0]
     
-    def _save_quiz_attempt(self, exercise: Dict, user_answer: Any, correct: bool):
-        """Save quiz attempt for progress tracking."""
-        try:
-            attempt = {
-                "exercise": exercise,
-                "user_answer": user_answer,
-                "correct": correct,
-                "timestamp": str(datetime.now())
-            }
+    def check_answers(self, answers: List[Tuple[Dict, Any]]) -> List[Dict]:
+        """Check a batch of (exercise, answer) pairs, e.g. a whole quiz, and record each attempt."""
+        short_answers = [
+            (exercise.get("expected_keywords", []), str(user_answer))
+            for exercise, user_answer in answers
+            if exercise.get("type", "multiple_choice") == "short_answer"
+        ]
+        grades = iter(grade_batch(short_answers))
+        
+        results = []
+        for exercise, user_answer in answers:
+            exercise_type = exercise.get("type", "multiple_choice")
+            result = {}
             
-            # Get existing attempts
-            try:
-                data = db.progress_db.get(ids=[f"{self.student_id}_quiz_attempts"])
-                attempts = json.loads(data["documents"][0]) if data and data.get("documents") else []
-            except Exception:
-                attempts = []
+            if exercise_type == "multiple_choice":
+                correct = user_answer == exercise.get("correct_answer")
+            elif exercise_type == "short_answer":
+                # Keyword coverage (stemmed, typo-tolerant) instead of any single substring hit
+                grade = next(grades)
+                correct = grade["correct"]
+                result.update({
+                    "coverage": grade["coverage"],
+                    "matched_keywords": grade["matched"],
+                    "missing_keywords": grade["missing"]
+                })
+            elif exercise_type == "coding":
+                # Run the student's code against the test cases, each in its own process
+                test_cases = [case for case in exercise.get("test_cases", []) if isinstance(case, dict)]
+                test_run = CodeExecutor.test_code(str(user_answer), test_cases)
+                correct = bool(test_cases) and test_run["all_passed"]
+                result["test_results"] = test_run
+            else:
+                correct = False
             
-            attempts.append(attempt)
+            result.update({
+                "correct": correct,
+                "explanation": exercise.get("explanation", ""),
+                "user_answer": user_answer,
+                "correct_answer": exercise.get("correct_answer") if exercise_type == "multiple_choice" else exercise.get("expected_keywords", [])
+            })
             
-            # Keep only last 100 attempts
-            if len(attempts) > 100:
-                attempts = attempts[-100:]
+            # Only library exercises count; placeholders (no id) are not real questions
+            if exercise.get("id"):
+                self._save_quiz_attempt(exercise, user_answer, correct)
+                EXERCISE_LIBRARY.record_attempt(exercise["id"], correct)
             
-            db.progress_db.upsert(
-                documents=[json.dumps(attempts)],
-                ids=[f"{self.student_id}_quiz_attempts"]
+            results.append(result)
+        
+        return results
+    
+    def rate_exercise(self, exercise: Dict, helpful: bool):
+        """Record the student's quality vote for a library exercise."""
+        if exercise.get("id"):
+            EXERCISE_LIBRARY.rate(exercise["id"], helpful)
+    
+    def _save_quiz_attempt(self, exercise: Dict, user_answer: Any, correct: bool):
+        """Append the attempt to the student's attempt log."""
+        try:
+            self.attempt_log.record(exercise, user_answer, correct)
+            get_selector(self.student_id).record_result(
+                exercise.get("topic", "General"), exercise.get("subtopic"), exercise.get("difficulty", "Intermediate"), correct
             )
         except Exception as e:
             print(f"Error saving quiz attempt: {e}")
+    
+    def get_accuracy(self, topic: Optional[str] = None, difficulty: Optional[str] = None) -> Dict:
+        """Answer accuracy overall, per topic or per difficulty."""
+        return self.attempt_log.accuracy(topic=topic, difficulty=difficulty)
+
+
+def generate_exercise_batch(topic: str, subtopic: str, difficulty: str, exercise_type: str = "multiple_choice",
+                            count: int = 5, priority: int = PRIORITY_BATCH, max_retries: int = 1,
+                            fill_defaults: bool = True, exclude: List[str] = ()) -> List[Dict]:
+    """Generate several exercises in one model call, avoiding the ``exclude`` questions.
+
+    Items are repaired locally against the exercise schema (types coerced,
+    optional fields defaulted); only the ones that stay invalid are requested
+    again (in one follow-up call per retry). Anything still missing after
+    the retries is filled with the default exercise unless ``fill_defaults``
+    is False, in which case fewer than ``count`` items may be returned.
+    """
+    schema = EXERCISE_SCHEMAS.get(exercise_type, EXERCISE_SCHEMAS["multiple_choice"])
+    exercises = []
+    attempts = 0
+    while len(exercises) < count and attempts <= max_retries:
+        missing = count - len(exercises)
+        for item in _request_exercise_batch(topic, subtopic, difficulty, exercise_type, missing, priority, exclude):
+            if len(exercises) >= count:
+                break
+            item, _ = repair(item, schema)
+            if _is_valid_exercise(item, exercise_type):
+                item["type"] = exercise_type
+                item["topic"] = topic
+                item["subtopic"] = subtopic
+                item["difficulty"] = difficulty
+                exercises.append(item)
+            else:
+                METRICS.record_parse_failure("exercise_batch")
+        attempts += 1
+
+    while fill_defaults and len(exercises) < count:
+        exercises.append(_get_default_exercise(topic, subtopic, difficulty, exercise_type))
+
+    return exercises
+
+
+def _get_default_exercise(topic: str, subtopic: str, difficulty: str, exercise_type: str) -> Dict:
+    """Return a default exercise if generation fails."""
+    return {
+        "type": exercise_type,
+        "question": f"Explain {subtopic} in {topic}.",
+        "topic": topic,
+        "subtopic": subtopic,
+        "difficulty": difficulty,
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correct_answer": 0,
+        "explanation": "This is a placeholder exercise."
+    }
+
+
+def _exclusion_text(questions: List[str]) -> str:
+    """Prompt lines asking the model not to repeat ``questions`` (empty if there are none)."""
+    if not questions:
+        return ""
+    listed = "\n".join(f"- {question}" for question in questions)
+    return f"\nThe student has already seen these questions; do not repeat them or ask the same thing:\n{listed}\n"
+
+
+def _request_exercise_batch(topic: str, subtopic: str, difficulty: str, exercise_type: str, count: int, priority: int,
+                            exclude: List[str] = ()) -> List[Dict]:
+    """Ask the model for ``count`` exercises as a JSON array."""
+    system_prompt = """You are an expert educational content creator. Generate engaging, educational exercises that help students learn effectively."""
+
+    item_format = EXERCISE_FORMATS.get(exercise_type, EXERCISE_FORMATS["multiple_choice"])
+    prompt = f"""Create {count} {exercise_type} exercises about {topic} - {subtopic} at {difficulty} difficulty level.
+
+Return a JSON array with exactly {count} distinct items, each in this format:
+{item_format}
+{_exclusion_text(exclude)}
+Return only the JSON array."""
+
+    try:
+        response = MODEL.generate_content(prompt, system_prompt=system_prompt, max_tokens=min(4096, 400 * count), priority=priority, call_site="exercise_batch")
+        if isinstance(response, str):
+            items = _parse_exercise_array(response)
+            return [item for item in items if isinstance(item, dict)]
+    except Exception as e:
+        print(f"Error generating exercise batch: {e}")
+    return []
+
+
+def _parse_exercise_array(text: str) -> List:
+    """Parse a JSON array of exercises from model output."""
+    from utils import extract_json
+    data = extract_json(text, list)
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        # Some models wrap the array, e.g. {"exercises": [...]}
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+    return []
+
+
+def _is_valid_exercise(exercise: Dict, exercise_type: str) -> bool:
+    """Check that an exercise has the fields its type needs."""
+    if not isinstance(exercise.get("question"), str) or not exercise["question"].strip():
+        return False
+    if exercise_type == "multiple_choice":
+        options = exercise.get("options")
+        answer = exercise.get("correct_answer")
+        return (
+            isinstance(options, list) and len(options) >= 2
+            and isinstance(answer, int) and not isinstance(answer, bool)
+            and 0 <= answer < len(options)
+        )
+    if exercise_type == "short_answer":
+        keywords = exercise.get("expected_keywords")
+        return isinstance(keywords, list) and len(keywords) > 0
+    if exercise_type == "coding":
+        return isinstance(exercise.get("test_cases"), list)
+    return True
+
+
+def _fill_exercise_pool(topic: str, subtopic: str, difficulty: str, exercise_type: str, count: int) -> List[Dict]:
+    """Generate valid exercises for the pool (placeholders are never pooled)."""
+    return generate_exercise_batch(topic, subtopic, difficulty, exercise_type, count,
+                                   priority=PRIORITY_BATCH, fill_defaults=False)
+
 
-from datetime import datetime
+# Shared pool for the process
+EXERCISE_POOL = ExercisePool(_fill_exercise_pool, EXERCISE_POOL_DEPTH)
+METRICS.add_source("exercise_pool", EXERCISE_POOL.metrics)
 
@@ -0,0 +1,232 @@
+"""Compact in-memory flashcard representation."""
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+# Timestamps are held as integer microseconds since this naive epoch
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+FIELDS = ("id", "front", "back", "topic", "subtopic", "interval_days",
+          "ease_factor", "repetitions", "mastered")
+TIMESTAMP_FIELDS = ("created_at", "next_review", "last_reviewed")
+KEY_ORDER = ("id", "front", "back", "topic", "subtopic", "created_at", "next_review",
+             "interval_days", "ease_factor", "repetitions", "last_reviewed", "mastered")
+
+_MISSING = object()
+
+
+def to_micros(value: datetime) -> int:
+    """Microseconds since EPOCH for a naive (local) datetime."""
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def parse_timestamp(value: Any):
+    """
+    Parse a stored timestamp into (micros, raw). ``raw`` is the original value
+    when it would not be reproduced exactly by ``str(datetime)`` (timezone
+    suffixes, other formats, unparseable text); otherwise None.
+    """
+    if value is None:
+        return None, None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return to_micros(value), None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None, value
+    aware = parsed.tzinfo is not None
+    if aware:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    try:
+        micros = to_micros(parsed)
+    except OverflowError:
+        return None, value
+    # "YYYY-MM-DD HH:MM:SS[.ffffff]" is what str(datetime) produces; checking
+    # the shape is much cheaper than formatting the parsed value again
+    canonical = not aware and value[10:11] == ' ' and (
+        len(value) == 19 and parsed.microsecond == 0 or len(value) == 26 and parsed.microsecond != 0
+    )
+    return micros, (None if canonical else value)
+
+
+class Flashcard:
+    """
+    One flashcard, stored in slots with numeric timestamps.
+
+    Supports the dict-style access the rest of the app uses (``card["id"]``,
+    ``card.get("front")``, item assignment), so timestamps are exposed as the
+    same strings that are persisted. ``to_dict`` reproduces the JSON the card
+    was loaded from, including unknown keys, missing keys and timestamps in
+    formats that do not round-trip through ``datetime``.
+    """
+
+    __slots__ = FIELDS + ("created_at_us", "next_review_us", "last_reviewed_us", "_raw", "_extra", "_absent")
+
+    def __init__(self, **fields):
+        for name in FIELDS:
+            setattr(self, name, None)
+        self.created_at_us = self.next_review_us = self.last_reviewed_us = None
+        self._raw: Optional[Dict[str, Any]] = None
+        self._extra: Optional[Dict[str, Any]] = None
+        self._absent: Optional[frozenset] = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Flashcard":
+        card = cls.__new__(cls)
+        get = data.get
+        card.id = get("id")
+        card.front = get("front")
+        card.back = get("back")
+        card.topic = get("topic")
+        card.subtopic = get("subtopic")
+        card.interval_days = get("interval_days")
+        card.ease_factor = get("ease_factor")
+        card.repetitions = get("repetitions")
+        card.mastered = get("mastered")
+
+        raw = None
+        card.created_at_us, value = parse_timestamp(get("created_at"))
+        if value is not None:
+            raw = {"created_at": value}
+        card.next_review_us, value = parse_timestamp(get("next_review"))
+        if value is not None:
+            raw = dict(raw or {}, next_review=value)
+        card.last_reviewed_us, value = parse_timestamp(get("last_reviewed"))
+        if value is not None:
+            raw = dict(raw or {}, last_reviewed=value)
+        card._raw = raw
+
+        card._absent = None
+        card._extra = None
+        if len(data) != len(KEY_ORDER) or any(key not in data for key in KEY_ORDER):
+            card._absent = frozenset(key for key in KEY_ORDER if key not in data) or None
+            card._extra = {key: value for key, value in data.items() if key not in KEY_ORDER} or None
+        return card
+
+    def to_dict(self) -> Dict:
+        data = {key: self[key] for key in KEY_ORDER if not (self._absent and key in self._absent)}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self._absent and key in self._absent:
+            return default
+        if key in TIMESTAMP_FIELDS:
+            if self._raw and key in self._raw:
+                return self._raw[key]
+            micros = getattr(self, f"{key}_us")
+            return None if micros is None else str(from_micros(micros))
+        if key in FIELDS:
+            return getattr(self, key)
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key: str, value: Any):
+        if self._absent and key in self._absent:
+            self._absent = (self._absent - {key}) or None
+        if key in TIMESTAMP_FIELDS:
+            micros, raw = parse_timestamp(value)
+            setattr(self, f"{key}_us", micros)
+            if raw is not None:
+                self._raw = dict(self._raw or {}, **{key: raw})
+            elif self._raw and key in self._raw:
+                del self._raw[key]
+        elif key in FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def due_timestamp(self) -> float:
+        """Epoch seconds of next_review (0.0, i.e. due now, when unset or unparseable)."""
+        if self.next_review_us is None:
+            return 0.0
+        try:
+            return from_micros(self.next_review_us).timestamp()
+        except (ValueError, OverflowError, OSError):
+            return 0.0
+
+    def __repr__(self) -> str:
+        return f"Flashcard({self.to_dict()!r})"
+
+
+def _sample_card(i: int) -> Dict:
+    now = datetime(2024, 5, 1, 12, 0, 0, 123456) + timedelta(minutes=i)
+    return {
+        "id": f"{i:012x}",
+        "front": f"What is concept number {i}?",
+        "back": f"Concept {i} is explained by this answer.",
+        "topic": "Python",
+        "subtopic": "Loops",
+        "created_at": str(now),
+        "next_review": str(now + timedelta(days=i % 30)),
+        "interval_days": i % 30,
+        "ease_factor": 2.5,
+        "repetitions": i % 6,
+        "last_reviewed": str(now) if i % 2 else None,
+        "mastered": False
+    }
+
+
+def benchmark(num_cards: int = 10000) -> Dict:
+    """
+    Compare dict cards with Flashcard objects: memory held by the loaded deck
+    and time to load it from JSON documents and compute every due timestamp
+    (what building the due index needs).
+    """
+    documents = [json.dumps(_sample_card(i)) for i in range(num_cards)]
+
+    def load_dicts():
+        cards = [json.loads(doc) for doc in documents]
+        for card in cards:
+            datetime.fromisoformat(card["next_review"].replace('Z', '+00:00')).timestamp()
+        return cards
+
+    def load_slotted():
+        cards = [Flashcard.from_dict(json.loads(doc)) for doc in documents]
+        for card in cards:
+            card.due_timestamp()
+        return cards
+
+    results = {}
+    for name, loader in (("dict", load_dicts), ("slots", load_slotted)):
+        started = time.perf_counter()
+        loader()
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        cards = loader()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del cards
+
+        results[name] = {"load_seconds": elapsed, "bytes_per_card": current / num_cards}
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in benchmark().items():
+        print(f"{name:>5}: {result['bytes_per_card']:.0f} bytes/card, load {result['load_seconds'] * 1000:.1f} ms for 10000 cards")
@@ -1,9 +1,16 @@
 """Flashcard system with spaced repetition."""
+import bisect
+import heapq
 import json
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Tuple
 from database import Database
-from config import MODEL
+from config import MODEL, FLASHCARD_SIMILARITY_THRESHOLD
+from scheduler import PRIORITY_BATCH
+from instrumentation import METRICS
+from flashcard_model import Flashcard
+from schemas import FLASHCARD_SCHEMA, complete, repair
 
 db = Database("./tutor_memory")
 
@@ -12,30 +19,109 @@ class FlashcardSystem:
     
     def __init__(self, student_id: str):
         self.student_id = student_id
+        self._cards_by_id: Dict[str, Flashcard] = {}
+        # Min-heap of (due timestamp, card id) for cards that are not mastered.
+        # Entries are invalidated lazily: only the one matching _due_at is live.
+        self._due_heap: List[Tuple[float, str]] = []
+        self._due_at: Dict[str, float] = {}
+        # Duplicate detection on card fronts: exact fingerprints, plus card ids
+        # by content words as the (small) candidate set for near-duplicates
+        self._fingerprints: Dict[str, str] = {}
+        self._content_index: Dict[frozenset, List[str]] = {}
+        # Running statistics: totals plus non-mastered cards per due day.
+        # _counted remembers each card's due timestamp (None when mastered) and
+        # _due_times holds the sorted due timestamps per day, so cards due later
+        # today are not counted as due before their time.
+        self._counters = _empty_counters()
+        self._counted: Dict[str, Optional[float]] = {}
+        self._due_times: Dict[str, List[float]] = {}
         self.flashcards = self._load_flashcards()
+        if _deck_deduped(student_id):
+            self._index_fronts()
+            self._build_due_index()
+        else:
+            # One-time cleanup of decks stored before inserts were deduplicated
+            self.dedupe_deck()
+            _mark_deck_deduped(student_id)
+        if _load_counters(student_id) != self._counters_document():
+            self._save_counters()
     
-    def _load_flashcards(self) -> List[Dict]:
-        """Load student's flashcards."""
+    def _load_flashcards(self) -> List[Flashcard]:
+        """Load student's flashcards (one document per card)."""
         try:
-            data = db.progress_db.get(ids=[f"{self.student_id}_flashcards"])
+            data = db.flashcard_db.get(where={"student_id": self.student_id})
             if data and data.get("documents"):
-                return json.loads(data["documents"][0])
-        except Exception:
-            pass
+                cards = [json.loads(doc) for doc in data["documents"]]
+                cards.sort(key=lambda c: (c.get("created_at") or "", c.get("id") or ""))
+                return [Flashcard.from_dict(card) for card in cards]
+        except Exception as e:
+            print(f"Error loading flashcards: {e}")
+        return self._migrate_legacy_deck()
+    
+    def _migrate_legacy_deck(self) -> List[Flashcard]:
+        """Move a deck stored as a single document into per-card documents."""
+        try:
+            legacy_id = f"{self.student_id}_flashcards"
+            data = db.progress_db.get(ids=[legacy_id])
+            if data and data.get("documents"):
+                cards = [Flashcard.from_dict(card) for card in json.loads(data["documents"][0])]
+                if cards:
+                    self._save_cards(cards)
+                db.progress_db.delete(ids=[legacy_id])
+                return cards
+        except Exception as e:
+            print(f"Error migrating flashcards: {e}")
         return []
     
-    def _save_flashcards(self):
-        """Save flashcards to database."""
+    def _card_doc_id(self, card_id: str) -> str:
+        return f"{self.student_id}_card_{card_id}"
+    
+    def _save_cards(self, cards: List[Flashcard]):
+        """Save only the given cards, in a single write."""
+        if not cards:
+            return
         try:
-            db.progress_db.upsert(
-                documents=[json.dumps(self.flashcards)],
-                ids=[f"{self.student_id}_flashcards"]
+            db.flashcard_db.upsert(
+                documents=[json.dumps(card.to_dict()) for card in cards],
+                ids=[self._card_doc_id(card["id"]) for card in cards],
+                metadatas=[{"student_id": self.student_id} for _ in cards]
             )
         except Exception as e:
             print(f"Error saving flashcards: {e}")
+        self._save_counters()
+    
+    def _save_counters(self):
+        """Persist the statistics counters so they can be read without loading the deck."""
+        try:
+            db.progress_db.upsert(
+                documents=[json.dumps(self._counters_document())],
+                ids=[_counters_doc_id(self.student_id)]
+            )
+        except Exception as e:
+            print(f"Error saving flashcard statistics: {e}")
+    
+    def _counters_document(self) -> Dict:
+        """
+        Counters as persisted: the per-day counts plus the exact due times of
+        today's and tomorrow's buckets, so a reader can tell which of the
+        current day's cards are already due.
+        """
+        today = datetime.now().date()
+        days = (today.isoformat(), (today + timedelta(days=1)).isoformat())
+        document = dict(self._counters)
+        document["due_times"] = {day: list(self._due_times[day]) for day in days if day in self._due_times}
+        return document
     
-    def generate_flashcards(self, topic: str, subtopic: str, num_cards: int = 5) -> List[Dict]:
+    def _save_card(self, card: Flashcard):
+        """Save a single card."""
+        self._save_cards([card])
+    
+    def generate_flashcards(self, topic: str, subtopic: str, num_cards: int = 5) -> List[Flashcard]:
         """Generate flashcards from a topic."""
+        return list(self.iter_generate_flashcards(topic, subtopic, num_cards))
+    
+    def iter_generate_flashcards(self, topic: str, subtopic: str, num_cards: int = 5) -> Iterator[Flashcard]:
+        """Generate flashcards from a topic, yielding each card as soon as the model has produced it."""
         system_prompt = """You are an expert at creating educational flashcards. Create clear, concise flashcards that help with memorization."""
         
         prompt = f"""Generate {num_cards} flashcards about {topic} - {subtopic}.
@@ -52,66 +138,257 @@ Return JSON array in this format:
 
 Make the flashcards clear, concise, and educational. Focus on key concepts, definitions, and important facts."""
         
+        created = []
+        parsed = 0
+        # Cards missing a side need a follow-up model call, which must wait until
+        # the stream has ended and given back its scheduler slot
+        incomplete = []
         try:
-            response = MODEL.generate_content(prompt, system_prompt=system_prompt)
-            if isinstance(response, str):
-                from utils import extract_json
-                cards_data = extract_json(response)
+            from utils import IncrementalJSONExtractor
+            extractor = IncrementalJSONExtractor()
+            for chunk in MODEL.stream_content(prompt, system_prompt=system_prompt, priority=PRIORITY_BATCH, call_site="flashcards"):
+                for card_data in extractor.feed(chunk):
+                    if isinstance(card_data, dict):
+                        parsed += 1
+                        if repair(card_data, FLASHCARD_SCHEMA)[1]:
+                            incomplete.append(card_data)
+                            continue
+                        card = self._add_card(card_data, topic, subtopic)
+                        if card:
+                            created.append(card)
+                            yield card
+            
+            for card_data in incomplete:
+                card = self._add_card(card_data, topic, subtopic)
+                if card:
+                    created.append(card)
+                    yield card
+            
+            if not parsed:
+                # Not a bare array (e.g. {"flashcards": [...]}); fall back to a full parse
+                cards_data = extractor.result()
                 if isinstance(cards_data, list):
-                    flashcards = []
                     for card_data in cards_data:
-                        flashcard = {
-                            "id": self._generate_card_id(),
-                            "front": card_data.get("front", ""),
-                            "back": card_data.get("back", ""),
-                            "topic": card_data.get("topic", topic),
-                            "subtopic": card_data.get("subtopic", subtopic),
-                            "created_at": str(datetime.now()),
-                            "next_review": str(datetime.now()),
-                            "interval_days": 1,
-                            "ease_factor": 2.5,
-                            "repetitions": 0,
-                            "last_reviewed": None,
-                            "mastered": False
-                        }
-                        flashcards.append(flashcard)
-                        self.flashcards.append(flashcard)
-                    
-                    self._save_flashcards()
-                    return flashcards
+                        if isinstance(card_data, dict):
+                            parsed += 1
+                            card = self._add_card(card_data, topic, subtopic)
+                            if card:
+                                created.append(card)
+                                yield card
+                if not parsed:
+                    METRICS.record_parse_failure("flashcards")
         except Exception as e:
             print(f"Error generating flashcards: {e}")
-        
-        return []
+        finally:
+            # Only the new cards are written
+            self._save_cards(created)
+    
+    def _add_card(self, card_data: Dict, topic: str, subtopic: str) -> Optional[Flashcard]:
+        """
+        Create a new flashcard from generated data and add it to the deck.
+        A card with only a front or only a back gets the other side from a
+        short follow-up call. Returns None if the card stays incomplete or the
+        deck already has a card with the same front.
+        """
+        if not (card_data.get("front") or card_data.get("back")):
+            METRICS.record_parse_failure("flashcards")
+            return None
+        card_data, missing = complete(card_data, FLASHCARD_SCHEMA, f"A flashcard about {topic} - {subtopic}.",
+                                      "flashcards", PRIORITY_BATCH)
+        if missing:
+            METRICS.record_parse_failure("flashcards")
+            return None
+        if self._find_duplicate(card_data.get("front", "")):
+            return None
+        now = datetime.now()
+        flashcard = Flashcard.from_dict({
+            "id": self._generate_card_id(),
+            "front": card_data.get("front", ""),
+            "back": card_data.get("back", ""),
+            "topic": card_data.get("topic", topic),
+            "subtopic": card_data.get("subtopic", subtopic),
+            "created_at": now,
+            "next_review": now,
+            "interval_days": 1,
+            "ease_factor": 2.5,
+            "repetitions": 0,
+            "last_reviewed": None,
+            "mastered": False
+        })
+        self.flashcards.append(flashcard)
+        self._index_card(flashcard)
+        self._index_front(flashcard)
+        return flashcard
     
     def _generate_card_id(self) -> str:
         """Generate unique card ID."""
         from utils import generate_id
-        import time
-        return generate_id(f"{self.student_id}_{time.time()}")
+        import uuid
+        # Cards generated in the same instant must not share an id now that each is its own document
+        return generate_id(f"{self.student_id}_{time.time()}_{uuid.uuid4().hex}")
     
-    def get_due_cards(self, limit: int = 10) -> List[Dict]:
-        """Get flashcards that are due for review."""
-        now = datetime.now()
-        due_cards = []
+    def _find_duplicate(self, front: str) -> Optional[str]:
+        """
+        Id of an existing card whose front matches ``front`` exactly or nearly,
+        if any. Only cards with the same content words are compared, so this
+        does not depend on the deck size.
+        """
+        from utils import content_words, text_fingerprint, text_shingles
+        card_id = self._fingerprints.get(text_fingerprint(front))
+        if card_id or FLASHCARD_SIMILARITY_THRESHOLD <= 0:
+            return card_id
         
-        for card in self.flashcards:
-            if card.get("mastered", False):
+        words = content_words(front)
+        if not words:
+            return None
+        shingles = text_shingles(front)
+        for other_id in self._content_index.get(words, ()):
+            other_card = self._cards_by_id.get(other_id)
+            if other_card is None:
                 continue
-            
-            next_review_str = card.get("next_review")
-            if next_review_str:
-                try:
-                    next_review = datetime.fromisoformat(next_review_str.replace('Z', '+00:00'))
-                    if next_review <= now:
-                        due_cards.append(card)
-                except:
-                    due_cards.append(card)
+            other = text_shingles(other_card.get("front", ""))
+            overlap = len(shingles & other)
+            if overlap / (len(shingles) + len(other) - overlap) >= FLASHCARD_SIMILARITY_THRESHOLD:
+                return other_id
+        return None
+    
+    def _index_front(self, card: Flashcard):
+        """Register a card's front for duplicate detection."""
+        from utils import content_words, text_fingerprint
+        card_id = card.get("id")
+        front = card.get("front", "")
+        self._fingerprints[text_fingerprint(front)] = card_id
+        words = content_words(front)
+        if words:
+            self._content_index.setdefault(words, []).append(card_id)
+    
+    def _index_fronts(self):
+        self._fingerprints = {}
+        self._content_index = {}
+        for card in self.flashcards:
+            self._index_front(card)
+    
+    def dedupe_deck(self) -> int:
+        """
+        Remove cards whose front is an exact duplicate (after folding case,
+        punctuation and whitespace), keeping the most reviewed copy (the oldest
+        one on ties). Near-duplicates are only rejected when new cards are
+        added; stored cards are never removed for being similar. Returns the
+        number of cards removed.
+        """
+        from utils import text_fingerprint
+        self._fingerprints = {}
+        self._content_index = {}
+        
+        order = sorted(range(len(self.flashcards)), key=lambda i: (-self.flashcards[i].get("repetitions", 0), i))
+        duplicate_ids = set()
+        for i in order:
+            card = self.flashcards[i]
+            if text_fingerprint(card.get("front", "")) in self._fingerprints:
+                duplicate_ids.add(card.get("id"))
             else:
-                due_cards.append(card)
-            
-            if len(due_cards) >= limit:
+                self._index_front(card)
+        
+        if duplicate_ids:
+            self.flashcards = [card for card in self.flashcards if card.get("id") not in duplicate_ids]
+            try:
+                db.flashcard_db.delete(ids=[self._card_doc_id(card_id) for card_id in duplicate_ids])
+            except Exception as e:
+                print(f"Error removing duplicate flashcards: {e}")
+        self._build_due_index()
+        if duplicate_ids:
+            self._save_counters()
+        return len(duplicate_ids)
+    
+    @staticmethod
+    def _due_timestamp(card: Flashcard) -> float:
+        """A card's next_review as an epoch timestamp (unset or unparseable means due now)."""
+        return card.due_timestamp()
+    
+    def _build_due_index(self):
+        """Index all cards by id and by due date."""
+        self._cards_by_id = {card.get("id"): card for card in self.flashcards}
+        self._due_at = {
+            card.get("id"): self._due_timestamp(card)
+            for card in self.flashcards
+            if not card.get("mastered", False)
+        }
+        self._due_heap = [(due, card_id) for card_id, due in self._due_at.items()]
+        heapq.heapify(self._due_heap)
+        
+        self._counters = _empty_counters()
+        self._counted = {}
+        self._due_times = {}
+        for card_id in self._cards_by_id:
+            self._count_card(card_id, self._due_at.get(card_id))
+    
+    def _index_card(self, card: Flashcard):
+        """Refresh a card's entries after it was added or rescheduled."""
+        card_id = card.get("id")
+        self._cards_by_id[card_id] = card
+        self._uncount_card(card_id)
+        if card.get("mastered", False):
+            self._due_at.pop(card_id, None)
+            self._count_card(card_id, None)
+            return
+        due = self._due_timestamp(card)
+        self._due_at[card_id] = due
+        heapq.heappush(self._due_heap, (due, card_id))
+        self._count_card(card_id, due)
+    
+    def _count_card(self, card_id: str, due: Optional[float]):
+        """Add a card to the counters (``due`` is None for mastered cards)."""
+        self._counted[card_id] = due
+        self._counters["total"] += 1
+        if due is None:
+            self._counters["mastered"] += 1
+        else:
+            due_day = _due_day(due)
+            buckets = self._counters["due_by_day"]
+            buckets[due_day] = buckets.get(due_day, 0) + 1
+            bisect.insort(self._due_times.setdefault(due_day, []), due)
+    
+    def _uncount_card(self, card_id: str):
+        """Remove a card's previous contribution to the counters, if any."""
+        if card_id not in self._counted:
+            return
+        due = self._counted.pop(card_id)
+        self._counters["total"] -= 1
+        if due is None:
+            self._counters["mastered"] -= 1
+        else:
+            due_day = _due_day(due)
+            buckets = self._counters["due_by_day"]
+            buckets[due_day] -= 1
+            if not buckets[due_day]:
+                del buckets[due_day]
+            times = self._due_times[due_day]
+            del times[bisect.bisect_left(times, due)]
+            if not times:
+                del self._due_times[due_day]
+    
+    def get_due_cards(self, limit: int = 10) -> List[Flashcard]:
+        """Get flashcards that are due for review, most overdue first."""
+        now = time.time()
+        due_cards = []
+        seen = set()
+        popped = []
+        
+        while self._due_heap and len(due_cards) < limit:
+            due, card_id = self._due_heap[0]
+            if self._due_at.get(card_id) != due or card_id in seen:
+                # Stale entry from an earlier schedule (or a duplicate): drop it for good
+                heapq.heappop(self._due_heap)
+                continue
+            if due > now:
                 break
+            popped.append(heapq.heappop(self._due_heap))
+            seen.add(card_id)
+            due_cards.append(self._cards_by_id[card_id])
+        
+        # Peeking should not consume the queue
+        for entry in popped:
+            heapq.heappush(self._due_heap, entry)
         
         return due_cards
     
@@ -120,9 +397,43 @@ Make the flashcards clear, concise, and educational. Focus on key concepts, defi
         Review a flashcard using SM-2 spaced repetition algorithm.
         Quality: 0-5 (0=blackout, 1=incorrect, 2=incorrect but remembered, 3=correct with difficulty, 4=correct, 5=perfect)
         """
-        card = next((c for c in self.flashcards if c.get("id") == card_id), None)
-        if not card:
+        card = self._apply_review(card_id, quality, datetime.now())
+        if card:
+            self._save_card(card)
+            self._record_retention([(card, quality)])
+    
+    def review_cards(self, results: List[Tuple[str, int]]) -> List[Flashcard]:
+        """Apply a batch of (card_id, quality) reviews and persist them in one write."""
+        now = datetime.now()
+        updated = {}
+        reviewed = []
+        for card_id, quality in results:
+            card = self._apply_review(card_id, quality, now)
+            if card:
+                updated[card_id] = card
+                reviewed.append((card, quality))
+        self._save_cards(list(updated.values()))
+        self._record_retention(reviewed)
+        return list(updated.values())
+    
+    def _record_retention(self, reviewed: List[Tuple[Flashcard, int]]):
+        """Feed review outcomes into the student's adaptive exercise ratings."""
+        if not reviewed:
             return
+        from adaptive import get_selector
+        get_selector(self.student_id).record_reviews(
+            (card.get("topic") or "General", card.get("subtopic"), quality) for card, quality in reviewed
+        )
+    
+    def start_review_session(self, prefetch: int = 10) -> "ReviewSession":
+        """Start a review session with the next ``prefetch`` due cards."""
+        return ReviewSession(self, prefetch)
+    
+    def _apply_review(self, card_id: str, quality: int, now: datetime) -> Optional[Flashcard]:
+        """Apply one SM-2 update in memory. Returns the card, or None if it does not exist."""
+        card = self._cards_by_id.get(card_id)
+        if not card:
+            return None
         
         # SM-2 Algorithm
         ease_factor = card.get("ease_factor", 2.5)
@@ -151,23 +462,165 @@ Make the flashcards clear, concise, and educational. Focus on key concepts, defi
         card["ease_factor"] = ease_factor
         card["interval_days"] = interval_days
         card["repetitions"] = repetitions
-        card["last_reviewed"] = str(datetime.now())
-        card["next_review"] = str(datetime.now() + timedelta(days=interval_days))
+        card["last_reviewed"] = now
+        card["next_review"] = now + timedelta(days=interval_days)
         card["mastered"] = repetitions >= 5 and interval_days >= 30
-        
-        self._save_flashcards()
-    
+        self._index_card(card)
+        return card
+
+    def forecast_workload(self, days: int = 30, quality: int = 4) -> List[int]:
+        """
+        Number of reviews due on each of the next ``days`` days, assuming every
+        due card is reviewed on time with ``quality``.
+        """
+        from spaced_repetition import VectorizedSM2
+
+        cards = self.flashcards
+        engine = VectorizedSM2.from_cards(cards, [self._due_timestamp(card) for card in cards])
+        return engine.forecast(days, time.time(), quality)
+
+    def bulk_reschedule(self, spread_days: int = 7) -> int:
+        """
+        Spread the overdue backlog evenly over the next ``spread_days`` days,
+        most overdue cards first. Returns the number of cards rescheduled.
+        """
+        from spaced_repetition import VectorizedSM2
+
+        cards = self.flashcards
+        engine = VectorizedSM2.from_cards(cards, [self._due_timestamp(card) for card in cards])
+        rescheduled = engine.reschedule_overdue(time.time(), spread_days)
+
+        updated = []
+        for index in rescheduled:
+            card = cards[index]
+            card["next_review"] = datetime.fromtimestamp(engine.due[index])
+            self._index_card(card)
+            updated.append(card)
+        self._save_cards(updated)
+        return len(updated)
+
     def get_statistics(self) -> Dict:
-        """Get flashcard statistics."""
-        total = len(self.flashcards)
-        mastered = sum(1 for c in self.flashcards if c.get("mastered", False))
-        due = len(self.get_due_cards(limit=1000))
+        """Get flashcard statistics (from the running counters, no pass over the deck)."""
+        return _statistics_from_counters(dict(self._counters, due_times=self._due_times))
+
+
+def _empty_counters() -> Dict:
+    return {"total": 0, "mastered": 0, "due_by_day": {}}
+
+
+def _counters_doc_id(student_id: str) -> str:
+    return f"{student_id}_flashcard_stats"
+
+
+def _deck_deduped(student_id: str) -> bool:
+    """Whether the one-time duplicate cleanup already ran for this deck."""
+    try:
+        data = db.progress_db.get(ids=[f"{student_id}_flashcards_deduped"])
+        return bool(data and data.get("documents"))
+    except Exception as e:
+        print(f"Error loading flashcard dedupe flag: {e}")
+        # Skip the cleanup rather than risk repeating it
+        return True
+
+
+def _mark_deck_deduped(student_id: str):
+    try:
+        db.progress_db.upsert(
+            documents=[json.dumps({"deduped_at": str(datetime.now())})],
+            ids=[f"{student_id}_flashcards_deduped"]
+        )
+    except Exception as e:
+        print(f"Error saving flashcard dedupe flag: {e}")
+
+
+def _due_day(timestamp: float) -> str:
+    """Local calendar day of a due timestamp, used as the counter bucket."""
+    try:
+        return datetime.fromtimestamp(timestamp).date().isoformat()
+    except (ValueError, OverflowError, OSError):
+        return datetime.fromtimestamp(0).date().isoformat()
+
+
+def _statistics_from_counters(counters: Dict) -> Dict:
+    """
+    Statistics from counters. ``due_for_review`` counts cards whose due time
+    has passed, like ``get_due_cards``; ``due_today`` also counts cards due
+    later today. Due and mastered never overlap, so in_progress is never negative.
+    """
+    total = counters["total"]
+    mastered = counters["mastered"]
+    now = time.time()
+    today = _due_day(now)
+    buckets = counters["due_by_day"]
+    due_today = sum(count for day, count in buckets.items() if day <= today)
+    today_times = (counters.get("due_times") or {}).get(today)
+    if today_times is not None:
+        due = due_today - buckets.get(today, 0) + bisect.bisect_right(today_times, now)
+    else:
+        # Exact times for today were not stored (deck last saved two or more
+        # days ago): count the whole day
+        due = due_today
+    
+    return {
+        "total_cards": total,
+        "mastered": mastered,
+        "due_for_review": due,
+        "due_today": due_today,
+        "in_progress": total - mastered - due,
+        "mastery_percentage": (mastered / total * 100) if total > 0 else 0
+    }
+
+
+def _load_counters(student_id: str) -> Optional[Dict]:
+    """Persisted statistics counters for a student's deck, if any."""
+    try:
+        data = db.progress_db.get(ids=[_counters_doc_id(student_id)])
+        if data and data.get("documents"):
+            return json.loads(data["documents"][0])
+    except Exception as e:
+        print(f"Error loading flashcard statistics: {e}")
+    return None
+
+
+def load_flashcard_statistics(student_id: str) -> Dict:
+    """Flashcard statistics for a student without loading their deck."""
+    return _statistics_from_counters(_load_counters(student_id) or _empty_counters())
+
+
+class ReviewSession:
+    """
+    A batch of flashcard reviews.
+
+    Due cards are prefetched up front; results are collected by the caller
+    and applied with a single ``submit`` (one SM-2 pass, one write) instead of
+    a save per card.
+    """
+    
+    def __init__(self, flashcard_system: FlashcardSystem, prefetch: int = 10):
+        self.flashcard_system = flashcard_system
+        self.cards = flashcard_system.get_due_cards(prefetch)
+        self.reviewed_ids = set()
+        self.reviewed_count = 0
+        self.correct_count = 0
+    
+    def remaining(self) -> List[Flashcard]:
+        """Prefetched cards that have not been submitted yet."""
+        return [card for card in self.cards if card.get("id") not in self.reviewed_ids]
+    
+    def submit(self, results: List[Tuple[str, int]]) -> Dict:
+        """Apply a batch of (card_id, quality) results and return updated statistics."""
+        updated = self.flashcard_system.review_cards(results)
+        qualities = dict(results)
+        for card in updated:
+            self.reviewed_ids.add(card["id"])
+            self.reviewed_count += 1
+            if qualities.get(card["id"], 0) >= 3:
+                self.correct_count += 1
         
         return {
-            "total_cards": total,
-            "mastered": mastered,
-            "due_for_review": due,
-            "in_progress": total - mastered - due,
-            "mastery_percentage": (mastered / total * 100) if total > 0 else 0
+            "reviewed": len(updated),
+            "session_reviewed": self.reviewed_count,
+            "session_correct": self.correct_count,
+            "remaining_in_session": len(self.remaining()),
+            "statistics": self.flashcard_system.get_statistics()
         }
-
@@ -0,0 +1,150 @@
+"""Keyword-coverage grading for short-answer exercises."""
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from config import SHORT_ANSWER_PASS_COVERAGE
+
+_TOKEN_RE = re.compile(r"\w+")
+# Stripped after the plural ending, longest first, at most one per word; a
+# stem keeps at least three characters (four for "ly", so "apply" stays)
+_SUFFIXES = ("ation", "ating", "ated", "ate", "ion", "ively", "ive", "edly", "ingly", "ing", "ed", "ly")
+
+
+def _strip(word: str, suffix: str, keep: int = 3) -> str:
+    """``word`` without ``suffix`` if it ends with it and ``keep`` characters remain, else ''."""
+    if word.endswith(suffix) and len(word) - len(suffix) >= keep:
+        return word[:-len(suffix)]
+    return ""
+
+
+def stem(word: str) -> str:
+    """
+    Light suffix-stripping stemmer. Singular and plural forms agree
+    (tree/trees -> tre, class/classes -> class), as do inflections and
+    -ation nouns of the same verb (iterate/iterating/iteration -> iter,
+    run/running -> run, make/making -> mak).
+    """
+    word = word.lower()
+    # Plurals: "es" only after s, x, z, ch or sh; class, analysis, status are not plurals
+    if _strip(word, "ies"):
+        return _strip(word, "ies") + "y"
+    if _strip(word, "ied"):
+        return _strip(word, "ied") + "y"
+    if word.endswith("es") and (word[-3:-2] in ("s", "x", "z") or word[-4:-2] in ("ch", "sh")) and _strip(word, "es"):
+        word = _strip(word, "es")
+    elif word[-2:-1] not in ("s", "i", "u") and _strip(word, "s"):
+        word = _strip(word, "s")
+
+    for suffix in _SUFFIXES:
+        base = _strip(word, suffix, 4 if suffix == "ly" else 3)
+        if base:
+            if len(base) >= 4 and base[-1] == base[-2] and base[-1] not in "aeiouylsz":
+                # running -> run, stopped -> stop
+                base = base[:-1]
+            return base
+    # A final "e" goes so the bare verb matches its inflections (make -> mak)
+    return _strip(word, "e") or word
+
+
+def tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _within_edit_distance(a: str, b: str, limit: int) -> bool:
+    """Levenshtein distance of a and b is at most ``limit`` (banded DP)."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _fuzzy_limit(word: str) -> int:
+    """Typos tolerated for a stem of this length (short stems must match exactly)."""
+    if len(word) >= 8:
+        return 2
+    if len(word) >= 6:
+        return 1
+    return 0
+
+
+class CompiledRubric:
+    """
+    A short-answer rubric compiled once: all expected keywords in a single
+    regex alternation over whole stemmed tokens, so inflections count
+    ("looping" matches "loop") but other words sharing a prefix do not
+    ("listen" does not match "list"). Keywords the regex misses get a
+    typo-tolerant pass over the answer's stemmed tokens.
+    """
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = [keyword for keyword in keywords if tokens(keyword)]
+        self._stems = [[stem(word) for word in tokens(keyword)] for keyword in self.keywords]
+        alternatives = []
+        # Longer phrases first so they win over keywords they contain
+        for index in sorted(range(len(self.keywords)), key=lambda i: -len(self._stems[i])):
+            phrase = " ".join(re.escape(word) for word in self._stems[index])
+            alternatives.append(f"(?P<k{index}>{phrase})")
+        # Matched against the answer's stems joined by single spaces
+        self._pattern = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b") if alternatives else None
+
+    def grade(self, answer: str) -> Dict:
+        """Coverage of the expected keywords in ``answer``."""
+        if not self.keywords:
+            return {"coverage": 0.0, "matched": [], "missing": []}
+
+        stems = [stem(word) for word in tokens(answer)]
+        matched = set()
+        for match in self._pattern.finditer(" ".join(stems)):
+            matched.add(int(match.lastgroup[1:]))
+
+        if len(matched) < len(self.keywords):
+            answer_stems = set(stems)
+            for index, keyword_stems in enumerate(self._stems):
+                if index not in matched and all(self._token_present(word, answer_stems) for word in keyword_stems):
+                    matched.add(index)
+
+        return {
+            "coverage": len(matched) / len(self.keywords),
+            "matched": [self.keywords[i] for i in sorted(matched)],
+            "missing": [self.keywords[i] for i in range(len(self.keywords)) if i not in matched]
+        }
+
+    @staticmethod
+    def _token_present(word: str, answer_stems: set) -> bool:
+        if word in answer_stems:
+            return True
+        limit = _fuzzy_limit(word)
+        return limit > 0 and any(
+            other[0] == word[0] and _within_edit_distance(word, other, limit) for other in answer_stems
+        )
+
+
+@lru_cache(maxsize=1024)
+def compile_rubric(keywords: Tuple[str, ...]) -> CompiledRubric:
+    """Compiled rubric for a keyword list, cached so each exercise is compiled once."""
+    return CompiledRubric(keywords)
+
+
+def grade_short_answer(expected_keywords: Sequence[str], answer: str,
+                       pass_coverage: float = SHORT_ANSWER_PASS_COVERAGE) -> Dict:
+    """Grade one answer; ``correct`` means at least ``pass_coverage`` of the keywords were covered."""
+    result = compile_rubric(tuple(expected_keywords or ())).grade(answer)
+    result["correct"] = bool(result["matched"]) and result["coverage"] >= pass_coverage
+    return result
+
+
+def grade_batch(items: Sequence[Tuple[Sequence[str], str]],
+                pass_coverage: float = SHORT_ANSWER_PASS_COVERAGE) -> List[Dict]:
+    """
+    Grade many (expected_keywords, answer) pairs, e.g. a whole quiz or every
+    student's answer to one question. Each distinct rubric is compiled once.
+    """
+    return [grade_short_answer(keywords, answer, pass_coverage) for keywords, answer in items]
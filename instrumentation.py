@@ -0,0 +1,187 @@
+"""Per-call-site instrumentation for model calls."""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, float("inf")]
+
+
+class CallSiteStats:
+    """Counters and a latency histogram for one call site."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.parse_failures = 0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.prompt_chars = 0
+        self.completion_chars = 0
+        self.providers: Dict[str, int] = {}
+
+    def observe_latency(self, latency_ms: float):
+        self.latency_total_ms += latency_ms
+        self.latency_max_ms = max(self.latency_max_ms, latency_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                self.latency_buckets[i] += 1
+                break
+
+    def _percentile(self, fraction: float) -> Optional[float]:
+        """Bucket upper bound containing the given fraction of calls."""
+        if not self.calls:
+            return None
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.latency_buckets):
+            seen += count
+            if seen >= target:
+                return bound if bound != float("inf") else self.latency_max_ms
+        return self.latency_max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "parse_failures": self.parse_failures,
+            "providers": dict(self.providers),
+            "latency_ms": {
+                "avg": self.latency_total_ms / self.calls if self.calls else 0.0,
+                "max": self.latency_max_ms,
+                "p50": self._percentile(0.5),
+                "p95": self._percentile(0.95),
+                "histogram": {
+                    ("le_inf" if bound == float("inf") else f"le_{bound}"): count
+                    for bound, count in zip(LATENCY_BUCKETS_MS, self.latency_buckets)
+                }
+            },
+            "prompt_chars": self.prompt_chars,
+            "completion_chars": self.completion_chars,
+            "avg_prompt_tokens": self.prompt_chars / 4 / self.calls if self.calls else 0.0,
+            "avg_completion_tokens": self.completion_chars / 4 / self.calls if self.calls else 0.0
+        }
+
+
+class ModelMetrics:
+    """
+    In-process registry of model call metrics keyed by call site.
+
+    ``track`` wraps a call; providers report fallbacks and errors for the
+    call running on the current thread with ``note_fallback``/``note_error``,
+    and callers report unparseable output with ``record_parse_failure``.
+    Other components can register extra snapshot sources (e.g. scheduler
+    queue depth) that are included in ``snapshot`` and periodic dumps.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, CallSiteStats] = {}
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+        self._local = threading.local()
+        self._dump_thread: Optional[threading.Thread] = None
+
+    def _site(self, call_site: str) -> CallSiteStats:
+        if call_site not in self._stats:
+            self._stats[call_site] = CallSiteStats()
+        return self._stats[call_site]
+
+    @contextmanager
+    def track(self, call_site: str, provider: str, prompt: str = ""):
+        """Measure one model call. Yields a dict; set ``result`` on it before leaving."""
+        call = {"call_site": call_site, "provider": provider, "fallbacks": 0, "error": False, "result": None}
+        previous = getattr(self._local, "call", None)
+        self._local.call = call
+        started = time.perf_counter()
+        try:
+            yield call
+        except Exception:
+            call["error"] = True
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            self._local.call = previous
+            result = call["result"]
+            with self._lock:
+                stats = self._site(call_site)
+                stats.calls += 1
+                stats.errors += 1 if call["error"] else 0
+                stats.fallbacks += call["fallbacks"]
+                stats.providers[call["provider"]] = stats.providers.get(call["provider"], 0) + 1
+                stats.prompt_chars += len(prompt or "")
+                stats.completion_chars += len(result) if isinstance(result, str) else 0
+                stats.observe_latency(latency_ms)
+
+    def note_fallback(self, provider: str):
+        """Record that the current call fell back to another provider."""
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call["fallbacks"] += 1
+            call["provider"] = provider
+
+    def note_error(self):
+        """Record that the current call ended in a provider error."""
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call["error"] = True
+
+    def record_parse_failure(self, call_site: str):
+        """Record that a call site could not parse the model output."""
+        with self._lock:
+            self._site(call_site).parse_failures += 1
+
+    def add_source(self, name: str, source: Callable[[], Dict]):
+        """Include another component's metrics in snapshots."""
+        self._sources[name] = source
+
+    def snapshot(self, call_site: Optional[str] = None) -> Dict:
+        """Current metrics for one call site, or for everything."""
+        with self._lock:
+            if call_site is not None:
+                stats = self._stats.get(call_site)
+                return stats.to_dict() if stats else CallSiteStats().to_dict()
+            data = {
+                "timestamp": str(datetime.now()),
+                "call_sites": {name: stats.to_dict() for name, stats in self._stats.items()}
+            }
+        for name, source in self._sources.items():
+            try:
+                data[name] = source()
+            except Exception as e:
+                data[name] = {"error": str(e)}
+        return data
+
+    def dump(self, path: str):
+        """Write a snapshot to a JSON file."""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error dumping model metrics: {e}")
+
+    def start_periodic_dump(self, path: str, interval_seconds: float):
+        """Dump a snapshot every ``interval_seconds`` on a daemon thread."""
+        if interval_seconds <= 0 or (self._dump_thread and self._dump_thread.is_alive()):
+            return
+
+        def _loop():
+            while True:
+                time.sleep(interval_seconds)
+                self.dump(path)
+
+        self._dump_thread = threading.Thread(target=_loop, name="model-metrics-dump", daemon=True)
+        self._dump_thread.start()
+
+
+# Shared registry for the process
+METRICS = ModelMetrics()
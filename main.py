@@ -91,6 +91,7 @@ def login_page():
                     st.session_state.progress_tracker = StudentProgressTracker(student_id)
                     st.session_state.achievement_system = AchievementSystem(student_id)
                     st.session_state.exercise_generator = ExerciseGenerator(student_id)
+                    st.session_state.exercise_generator.warm_pool()
                     st.session_state.flashcard_system = FlashcardSystem(student_id)
                     st.session_state.messages = []
                     st.rerun()
@@ -150,7 +151,15 @@ def chat_page():
         uploaded_image = st.file_uploader("📷 Upload Image", type=["png", "jpg", "jpeg"], help="Ask questions about images!")
     with col2:
         uploaded_doc = st.file_uploader("📄 Upload Document", type=["pdf", "txt", "md"], help="Get help with documents!")
-    
+
+    # Deliver achievements unlocked by background tasks since the last render
+    new_achievements = st.session_state.tutor.pop_achievement_notifications()
+    if new_achievements:
+        achievement_text = "🎉 **New Achievement Unlocked!**\n\n"
+        for ach in new_achievements:
+            achievement_text += f"{ach.get('icon', '🏅')} **{ach.get('name', '')}** - {ach.get('description', '')}\n"
+        st.session_state.messages.append({"role": "assistant", "content": achievement_text})
+
     # Display chat history
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -334,6 +343,17 @@ def show_analytics_page():
     with col3:
         st.metric("Mastery Level", f"{performance['mastery_level']}%")
     
+    # Flashcards
+    st.markdown("### 🗂️ Flashcards")
+    flashcard_stats = stats["flashcards"]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Cards", flashcard_stats["total_cards"])
+    with col2:
+        st.metric("Mastered", f"{flashcard_stats['mastery_percentage']:.0f}%")
+    with col3:
+        st.metric("Due for Review", flashcard_stats["due_for_review"])
+    
     # Recommendations
     st.markdown("### 💡 Personalized Recommendations")
     for rec in stats["recommendations"]:
@@ -343,15 +363,20 @@ def generate_exercise_interface(topic: str):
     """Interface for generating and solving exercises."""
     st.markdown(f"### 🎯 Exercise: {topic}")
     
+    exercise_types = {"Multiple choice": "multiple_choice", "Coding": "coding"}
+    exercise_type = st.selectbox("Exercise type", list(exercise_types), key="exercise_type")
+    
     if st.button("Generate New Exercise"):
         with st.spinner("Generating exercise..."):
+            subtopic, difficulty = st.session_state.exercise_generator.choose_next(topic)
             exercise = st.session_state.exercise_generator.generate_exercise(
-                topic, "General", "Intermediate", "multiple_choice"
+                topic, subtopic, difficulty, exercise_types[exercise_type]
             )
             st.session_state.current_exercise = exercise
     
     if "current_exercise" in st.session_state:
         exercise = st.session_state.current_exercise
+        st.caption(f"{exercise.get('subtopic', 'General')} · {exercise.get('difficulty', 'Intermediate')}")
         st.markdown(f"**Question:** {exercise.get('question', '')}")
         
         if exercise.get("type") == "multiple_choice":
@@ -364,6 +389,33 @@ def generate_exercise_interface(topic: str):
                     st.success("✅ Correct! " + result["explanation"])
                 else:
                     st.error("❌ Incorrect. " + result["explanation"])
+        
+        elif exercise.get("type") == "coding":
+            code = st.text_area("Your code:", value=exercise.get("starter_code", ""), height=200, key="exercise_code")
+            
+            if st.button("Run Tests"):
+                with st.spinner("Running tests..."):
+                    result = st.session_state.exercise_generator.check_answer(exercise, code)
+                test_run = result.get("test_results", {})
+                if result["correct"]:
+                    st.success(f"✅ All {test_run.get('total_tests', 0)} tests passed!")
+                else:
+                    st.error(f"❌ {test_run.get('passed_tests', 0)}/{test_run.get('total_tests', 0)} tests passed.")
+                for test in test_run.get("results", []):
+                    status = "✅" if test["passed"] else "❌"
+                    detail = test.get("error") or f"expected {test['expected']}, got {test['actual']}"
+                    st.write(f"{status} Test {test['test_case']}: `{test['input']}` ({test['duration_ms']:.0f} ms) - {detail}")
+        
+        if exercise.get("id"):
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("👍 Good question", key=f"rate_up_{exercise['id']}"):
+                    st.session_state.exercise_generator.rate_exercise(exercise, True)
+                    st.success("Thanks for the feedback!")
+            with col2:
+                if st.button("👎 Poor question", key=f"rate_down_{exercise['id']}"):
+                    st.session_state.exercise_generator.rate_exercise(exercise, False)
+                    st.info("Thanks, we'll show this question less often.")
 
 def generate_quiz_interface(topic: str):
     """Interface for taking quizzes."""
@@ -374,8 +426,10 @@ def generate_quiz_interface(topic: str):
             quiz = st.session_state.exercise_generator.generate_quiz(topic, 5)
             st.session_state.current_quiz = quiz
             st.session_state.quiz_answers = {}
+        if not quiz:
+            st.warning("Couldn't generate new quiz questions right now. Please try again in a moment.")
     
-    if "current_quiz" in st.session_state:
+    if st.session_state.get("current_quiz"):
         quiz = st.session_state.current_quiz
         for i, question in enumerate(quiz):
             st.markdown(f"**Question {i+1}:** {question.get('question', '')}")
@@ -384,14 +438,13 @@ def generate_quiz_interface(topic: str):
             st.session_state.quiz_answers[i] = options.index(answer) if answer in options else 0
         
         if st.button("Submit Quiz"):
-            score = 0
-            for i, question in enumerate(quiz):
-                user_answer = st.session_state.quiz_answers.get(i, 0)
-                result = st.session_state.exercise_generator.check_answer(question, user_answer)
-                if result["correct"]:
-                    score += 1
+            answers = [(question, st.session_state.quiz_answers.get(i, 0)) for i, question in enumerate(quiz)]
+            results = st.session_state.exercise_generator.check_answers(answers)
+            score = sum(1 for result in results if result["correct"])
             
             st.success(f"Quiz Complete! Score: {score}/{len(quiz)} ({score/len(quiz)*100:.1f}%)")
+            accuracy = st.session_state.exercise_generator.get_accuracy(topic=quiz[0].get("topic", topic))
+            st.info(f"All-time accuracy on {topic}: {accuracy['correct']}/{accuracy['total']} ({accuracy['accuracy']*100:.1f}%)")
 
 def generate_flashcards_interface(topic: str):
     """Interface for flashcards."""
@@ -400,39 +453,69 @@ def generate_flashcards_interface(topic: str):
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Generate New Flashcards"):
-            with st.spinner("Generating flashcards..."):
-                cards = st.session_state.flashcard_system.generate_flashcards(topic, "General", 10)
-                st.success(f"Generated {len(cards)} flashcards!")
+            # Show cards as they are generated instead of waiting for the whole deck
+            placeholder = st.empty()
+            cards = []
+            for card in st.session_state.flashcard_system.iter_generate_flashcards(topic, "General", 10):
+                cards.append(card)
+                placeholder.info(f"Generated {len(cards)} flashcards... latest: {card.get('front', '')}")
+            placeholder.success(f"Generated {len(cards)} flashcards!")
     
     with col2:
         if st.button("Review Due Cards"):
-            due_cards = st.session_state.flashcard_system.get_due_cards(10)
-            if due_cards:
-                st.session_state.current_flashcard = due_cards[0]
-                st.session_state.flashcard_index = 0
+            session = st.session_state.flashcard_system.start_review_session(10)
+            if session.cards:
+                st.session_state.review_session = session
+                st.session_state.review_results = []
             else:
                 st.info("No cards due for review!")
     
-    if "current_flashcard" in st.session_state:
-        card = st.session_state.current_flashcard
-        st.markdown(f"**Front:** {card.get('front', '')}")
+    if "review_session" in st.session_state:
+        # Results are collected locally and saved in one batch when the session ends
+        session = st.session_state.review_session
+        results = st.session_state.review_results
+        answered = {card_id for card_id, _ in results}
+        pending = [card for card in session.remaining() if card.get("id") not in answered]
         
-        if st.button("Show Answer"):
-            st.markdown(f"**Back:** {card.get('back', '')}")
+        if pending:
+            card = pending[0]
+            st.markdown(f"**Card {len(answered) + 1} of {len(answered) + len(pending)}**")
+            st.markdown(f"**Front:** {card.get('front', '')}")
+            
+            if st.checkbox("Show Answer", key=f"show_answer_{card['id']}"):
+                st.markdown(f"**Back:** {card.get('back', '')}")
             
             st.markdown("**How well did you know this?**")
-            quality = st.slider("Quality (0-5)", 0, 5, 3, key="flashcard_quality")
+            quality = st.slider("Quality (0-5)", 0, 5, 3, key=f"flashcard_quality_{card['id']}")
             
-            if st.button("Submit Review"):
-                st.session_state.flashcard_system.review_card(card["id"], quality)
-                st.success("Card reviewed! Next review scheduled.")
-                del st.session_state.current_flashcard
+            if st.button("Next Card"):
+                results.append((card["id"], quality))
+                st.rerun()
+        else:
+            st.info("All cards in this session answered.")
+        
+        if results and st.button("Finish Session" if pending else "Submit Reviews"):
+            summary = session.submit(results)
+            st.success(f"Reviewed {summary['session_reviewed']} cards ({summary['session_correct']} correct). Next reviews scheduled.")
+            del st.session_state.review_session
+            del st.session_state.review_results
     
     # Statistics
     stats = st.session_state.flashcard_system.get_statistics()
     st.metric("Total Cards", stats["total_cards"])
     st.metric("Mastered", stats["mastered"])
     st.metric("Due for Review", stats["due_for_review"])
+    st.caption(f"{stats['due_today']} due by the end of today")
+    
+    # Workload forecast and backlog rescheduling (computed over the whole deck)
+    if stats["total_cards"] and st.checkbox("Show review forecast"):
+        forecast = st.session_state.flashcard_system.forecast_workload(14)
+        st.bar_chart({"Reviews due": forecast})
+        st.caption("Reviews per day for the next 14 days, if every card is reviewed on time")
+    if stats["due_for_review"] > 10:
+        if st.button("Spread overdue cards over the next 7 days"):
+            rescheduled = st.session_state.flashcard_system.bulk_reschedule(7)
+            st.success(f"Rescheduled {rescheduled} overdue cards.")
 
 def create_study_plan_interface(topic: str):
     """Interface for creating study plans."""
@@ -0,0 +1,159 @@
+"""Rolling conversation summary memory per student."""
+import json
+import queue
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from config import MODEL, FALLBACK_RESPONSE, SUMMARY_EVERY_N_TURNS, SUMMARY_MAX_WORDS
+from context import format_turn
+from database import Database
+from scheduler import PRIORITY_BACKGROUND
+
+db = Database("./tutor_memory")
+
+
+class ConversationMemory:
+    """
+    Compact, incrementally updated summary of a student's conversation history.
+
+    The summary is refreshed every ``SUMMARY_EVERY_N_TURNS`` turns by folding
+    only the turns since the last refresh into the previous summary, so the
+    cost of an update and the size of the summary do not grow with history.
+    """
+
+    def __init__(self, student_id: str, every_n_turns: int = SUMMARY_EVERY_N_TURNS):
+        self.student_id = student_id
+        self.every_n_turns = max(1, every_n_turns)
+        self.data = self._load_summary()
+
+    def _load_summary(self) -> Dict:
+        """Load the stored summary."""
+        try:
+            data = db.progress_db.get(ids=[f"{self.student_id}_summary"])
+            if data and data.get("documents"):
+                return json.loads(data["documents"][0])
+        except Exception:
+            pass
+        return {"summary": "", "turns_summarized": 0, "updated_at": None}
+
+    def _save_summary(self):
+        """Save the summary to database."""
+        try:
+            db.progress_db.upsert(
+                documents=[json.dumps(self.data)],
+                ids=[f"{self.student_id}_summary"]
+            )
+        except Exception as e:
+            print(f"Error saving conversation summary: {e}")
+
+    @property
+    def summary(self) -> str:
+        return self.data.get("summary", "")
+
+    def is_due(self, total_turns: int) -> bool:
+        """Check whether enough new turns have accumulated for an update."""
+        return total_turns - self.data.get("turns_summarized", 0) >= self.every_n_turns
+
+    def update(self, conversations: List[Dict]):
+        """
+        Fold turns added since the last update into the summary. A backlog
+        (e.g. after a provider outage) is folded in chunks of at most
+        ``2 * every_n_turns`` turns, oldest first, so every turn counted as
+        summarized was actually sent; if a call fails the rest waits for a
+        later update.
+        """
+        summarized = self.data.get("turns_summarized", 0)
+        previous = self.summary
+        if len(conversations) < summarized:
+            # History was reset or trimmed; start over from what is stored
+            summarized = 0
+            previous = ""
+
+        chunk_size = self.every_n_turns * 2
+        while summarized < len(conversations):
+            chunk = conversations[summarized:summarized + chunk_size]
+            summary = self._fold(previous, chunk)
+            if summary is None:
+                return
+            summarized += len(chunk)
+            previous = summary
+            self.data["summary"] = summary
+            self.data["turns_summarized"] = summarized
+            self.data["updated_at"] = str(datetime.now())
+            self._save_summary()
+
+    def _fold(self, previous: str, turns: List[Dict]) -> Optional[str]:
+        """Summary with ``turns`` folded into ``previous``, or None if the model call failed."""
+        formatted = "\n".join(filter(None, (format_turn(entry) for entry in turns)))
+
+        prompt = f"""Update the running summary of a tutoring relationship with a student.
+
+Current summary:
+{previous or "(none yet)"}
+
+New conversation turns:
+{formatted}
+
+Write the updated summary in at most {SUMMARY_MAX_WORDS} words. Keep the topics studied, the student's level, recurring difficulties or misconceptions, and stated goals or preferences. Drop small talk and details that are no longer relevant. Return only the summary text."""
+
+        try:
+            response = MODEL.generate_content(prompt, max_tokens=SUMMARY_MAX_WORDS * 2, temperature=0.3, priority=PRIORITY_BACKGROUND, call_site="conversation_summary")
+            if not isinstance(response, str) or not response.strip() or response.strip() == FALLBACK_RESPONSE:
+                # Provider failed; keep the previous summary and retry on a later turn
+                print(f"Conversation summary for {self.student_id} not updated: no usable model response")
+                return None
+            words = response.strip().split()
+            return " ".join(words[:SUMMARY_MAX_WORDS])
+        except Exception as e:
+            print(f"Error updating conversation summary for {self.student_id}: {e}")
+            return None
+
+
+class SummaryWorker:
+    """
+    Runs summary updates on their own thread, one student at a time.
+
+    Summaries are background-priority model calls that can wait a long time
+    for a rate-limit slot, so they are kept off the shared background queue
+    where they would hold up storing the next turns. Requests for a student
+    already waiting are coalesced. They are not journaled: a lost update is
+    requested again by the next turn, since the summary is still due.
+    """
+
+    def __init__(self, run: Callable[[str], None]):
+        self.run = run
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    def request(self, student_id: str):
+        """Queue a summary update for a student (no-op if one is already waiting)."""
+        with self._lock:
+            if student_id in self._pending:
+                return
+            self._pending.add(student_id)
+        self._ensure_worker()
+        self._queue.put(student_id)
+
+    def join(self):
+        self._queue.join()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="conversation-summary", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            student_id = self._queue.get()
+            with self._lock:
+                # Turns stored from here on are picked up by this update
+                self._pending.discard(student_id)
+            try:
+                self.run(student_id)
+            except Exception as e:
+                print(f"Error updating conversation summary: {e}")
+            finally:
+                self._queue.task_done()
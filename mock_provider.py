@@ -0,0 +1,213 @@
+"""Deterministic offline model provider for load and latency testing."""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+
+class MockProviderError(Exception):
+    """Simulated provider failure."""
+
+
+class MockProvider:
+    """
+    Stand-in for a real model that returns schema-correct responses for each
+    call site in the app.
+
+    Response content depends only on the prompt and the seed, so runs are
+    reproducible. Latency and failures are drawn per call from one stream
+    seeded by ``seed``, so a repeated prompt still sees the configured
+    distribution: latency from ``fixed``, ``uniform``, ``normal`` or
+    ``lognormal`` around ``latency_ms`` with ``jitter_ms`` spread, and
+    ``error_rate`` of calls raising ``MockProviderError``.
+    """
+
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, distribution: str = "lognormal",
+                 error_rate: float = 0.0, seed: int = 0, stream_chunk_chars: int = 16):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.seed = seed
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self._timing_rng = random.Random(seed)
+        self._timing_lock = threading.Lock()
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode()).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def _draw_call(self):
+        """Latency in seconds and whether this call fails, from the per-instance stream."""
+        with self._timing_lock:
+            return self._latency_seconds(self._timing_rng), self._timing_rng.random() < self.error_rate
+
+    def _latency_seconds(self, rng: random.Random) -> float:
+        mean = self.latency_ms
+        spread = self.jitter_ms
+        if self.distribution == "fixed" or mean <= 0:
+            latency = mean
+        elif self.distribution == "uniform":
+            latency = rng.uniform(mean - spread, mean + spread)
+        elif self.distribution == "normal":
+            latency = rng.gauss(mean, spread)
+        else:
+            # Lognormal with the requested mean and standard deviation
+            variance = spread ** 2
+            sigma2 = math.log(1 + variance / (mean ** 2))
+            mu = math.log(mean) - sigma2 / 2
+            latency = rng.lognormvariate(mu, sigma2 ** 0.5)
+        return max(0.0, latency) / 1000
+
+    def generate(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 2048) -> str:
+        """Return a full response after the simulated latency."""
+        latency, failed = self._draw_call()
+        time.sleep(latency)
+        if failed:
+            raise MockProviderError("Simulated provider failure")
+        return self._respond(prompt, self._rng(prompt), max_tokens)
+
+    def stream(self, prompt: str, system_prompt: Optional[str] = None, max_tokens: int = 2048) -> Iterator[str]:
+        """Yield the response in chunks, spreading the latency across them."""
+        latency, failed = self._draw_call()
+        if failed:
+            time.sleep(latency)
+            raise MockProviderError("Simulated provider failure")
+
+        text = self._respond(prompt, self._rng(prompt), max_tokens)
+        chunks = [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)] or [""]
+        # Time to first chunk is about half the latency, the rest is spread out
+        time.sleep(latency / 2)
+        per_chunk = latency / 2 / len(chunks)
+        for chunk in chunks:
+            yield chunk
+            time.sleep(per_chunk)
+
+    def _respond(self, prompt: str, rng: random.Random, max_tokens: int) -> str:
+        """Pick a response shape from the prompt of the calling site."""
+        lowered = prompt.lower()
+        if "classify the following question" in lowered:
+            text = self._classification(prompt, rng)
+        elif "classify the difficulty level" in lowered:
+            text = rng.choice(["Basic", "Intermediate", "Advanced"])
+        elif "flashcards about" in lowered:
+            text = self._flashcards(prompt, rng)
+        elif "exercise about" in lowered or "exercises about" in lowered:
+            text = self._exercise(prompt, rng)
+        elif "study plan for learning" in lowered:
+            text = self._study_plan(prompt, rng)
+        else:
+            text = self._free_text(rng)
+
+        # Roughly honour the token limit for free text (~4 chars per token)
+        if not text.lstrip().startswith(("{", "[")):
+            text = text[:max_tokens * 4]
+        return text
+
+    def _classification(self, prompt: str, rng: random.Random) -> str:
+        topics = {
+            "Computer Science": ["Algorithms", "Data Structures", "Python"],
+            "Mathematics": ["Algebra", "Calculus", "Statistics"],
+            "Science": ["Physics", "Chemistry", "Biology"],
+            "History": ["Ancient History", "Modern History"]
+        }
+        topic = rng.choice(sorted(topics))
+        return json.dumps({"topic": topic, "subtopic": rng.choice(topics[topic])})
+
+    def _flashcards(self, prompt: str, rng: random.Random) -> str:
+        match = re.search(r"Generate (\d+) flashcards about (.+?) - (.+?)\.", prompt)
+        count = int(match.group(1)) if match else 5
+        topic = match.group(2) if match else "General"
+        subtopic = match.group(3) if match else "General"
+        cards = [
+            {
+                "front": f"{subtopic} concept {i + 1} (#{rng.randint(100, 999)})",
+                "back": f"Definition of {subtopic} concept {i + 1} in {topic}.",
+                "topic": topic,
+                "subtopic": subtopic
+            }
+            for i in range(count)
+        ]
+        return "Here are your flashcards:\n```json\n" + json.dumps(cards, indent=2) + "\n```"
+
+    def _exercise_item(self, exercise_type: str, topic: str, subtopic: str, rng: random.Random) -> Dict:
+        number = rng.randint(100, 999)
+        if exercise_type == "coding":
+            return {
+                "question": f"Write a function add(a, b) that returns the sum ({subtopic} #{number}).",
+                "starter_code": "def add(a, b):\n    # Your code here\n    pass",
+                "test_cases": [
+                    {"input": "add(1, 2)", "expected_output": "3"},
+                    {"input": "add(-1, 1)", "expected_output": "0"}
+                ],
+                "hints": ["Use the + operator"],
+                "solution": "def add(a, b):\n    return a + b"
+            }
+        if exercise_type == "short_answer":
+            return {
+                "question": f"Briefly explain {subtopic} in {topic} (#{number}).",
+                "expected_keywords": [subtopic.lower(), topic.lower()],
+                "explanation": f"A good answer mentions {subtopic} and how it relates to {topic}.",
+                "hints": [f"Think about what {subtopic} is used for"]
+            }
+        correct = rng.randrange(4)
+        return {
+            "question": f"Which statement about {subtopic} in {topic} is true? (#{number})",
+            "options": [f"Statement {chr(65 + i)}" for i in range(4)],
+            "correct_answer": correct,
+            "explanation": f"Statement {chr(65 + correct)} is the correct one.",
+            "hints": ["Eliminate the obviously wrong options first"]
+        }
+
+    def _exercise(self, prompt: str, rng: random.Random) -> str:
+        batch = re.search(r"Create (\d+) (\w+) exercises about (.+?) - (.+?) at", prompt)
+        if batch:
+            count, exercise_type, topic, subtopic = int(batch.group(1)), batch.group(2), batch.group(3), batch.group(4)
+            items = [self._exercise_item(exercise_type, topic, subtopic, rng) for _ in range(count)]
+            return "```json\n" + json.dumps(items, indent=2) + "\n```"
+
+        match = re.search(r"Create an? (\w+) exercise about (.+?) - (.+?) at", prompt)
+        exercise_type = match.group(1) if match else "multiple_choice"
+        topic = match.group(2) if match else "General"
+        subtopic = match.group(3) if match else "General"
+        return "```json\n" + json.dumps(self._exercise_item(exercise_type, topic, subtopic, rng), indent=2) + "\n```"
+
+    def _study_plan(self, prompt: str, rng: random.Random) -> str:
+        match = re.search(r"Create a (\d+)-day study plan for learning (.+?)\.", prompt)
+        days = int(match.group(1)) if match else 7
+        topic = match.group(2) if match else "General"
+        hours = re.search(r"approximately ([\d.]+) hours", prompt)
+        hours_per_day = float(hours.group(1)) if hours else 1.0
+        plan = {
+            "topic": topic,
+            "duration_days": days,
+            "hours_per_day": hours_per_day,
+            "daily_plans": [
+                {
+                    "day": day + 1,
+                    "date": "YYYY-MM-DD",
+                    "topics": [f"{topic} part {day + 1}"],
+                    "activities": rng.sample(["Read", "Practice", "Review", "Quiz", "Project"], 2),
+                    "estimated_time": hours_per_day,
+                    "resources": [f"{topic} notes"]
+                }
+                for day in range(days)
+            ],
+            "learning_objectives": [f"Understand the basics of {topic}"],
+            "milestones": [f"Finish day {days}"]
+        }
+        return json.dumps(plan, indent=2)
+
+    def _free_text(self, rng: random.Random) -> str:
+        sentences: List[str] = [
+            "Great question! Let's break it down step by step.",
+            "First, consider the underlying definition and why it matters.",
+            "A helpful analogy is to think of it like organising books on a shelf.",
+            "Try working through a small example on your own to check your understanding.",
+            "What do you think would happen if we changed one of the assumptions?"
+        ]
+        return " ".join(rng.sample(sentences, rng.randint(3, len(sentences))))
@@ -83,7 +83,7 @@ class MultimodalProcessor:
             if len(document_text) > 2000:
                 summary_prompt = f"Summarize the key points from this document:\n\n{document_text[:2000]}..."
                 try:
-                    summary = MODEL.generate_content(summary_prompt)
+                    summary = MODEL.generate_content(summary_prompt, call_site="document_summary")
                     if isinstance(summary, str):
                         document_text = summary
                 except:
@@ -102,7 +102,7 @@ class MultimodalProcessor:
             enhanced_prompt = text
         
         try:
-            response = MODEL.generate_content(enhanced_prompt)
+            response = MODEL.generate_content(enhanced_prompt, call_site="multimodal_answer")
             if isinstance(response, str):
                 return response
             return str(response)
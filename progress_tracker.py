@@ -1,6 +1,8 @@
 import json
 from datetime import datetime
-from config import MODEL
+from config import MODEL, CLASSIFY_CONTEXT_TOKEN_BUDGET
+from instrumentation import METRICS
+from context import ContextAssembler
 from database import Database
 from utils import clean_text, extract_json
 import re
@@ -11,6 +13,7 @@ class StudentProgressTracker:
     def __init__(self, student_id):
         self.student_id = student_id
         self.progress = self.get_progress()
+        self.context_assembler = ContextAssembler(CLASSIFY_CONTEXT_TOKEN_BUDGET, max_recent=3, max_relevant=3)
 
     def get_progress(self):
         """Retrieve or initialize student progress."""
@@ -33,20 +36,8 @@ class StudentProgressTracker:
         past_conversation = db.get_conversation(self.student_id) or []
         relevant_interactions = db.retrieve_relevant_interactions(user_input, self.student_id) or []
 
-        # Combine past and relevent
-        num_past = min(3, len(past_conversation))
-        conversation_history = past_conversation[-num_past:] if past_conversation else []
-        conversation_history.extend(relevant_interactions) 
-
-        
-
-        # Prepare context
-        formatted_conversation = []
-        for entry in conversation_history:
-            if "question" in entry and "response" in entry:
-                formatted_conversation.append(f"Student: {entry['question']}\nAI Tutor: {entry['response']}")
-
-        context = "\n".join(formatted_conversation)
+        # Prepare context (deduplicated, within the classifier's token budget)
+        context = self.context_assembler.build(past_conversation, relevant_interactions)
 
         prompt = f"""Classify the following question into a specific subject or broader area (topic) and exact field within the subject (subtopic). 
         Return a JSON object with the keys 'topic' and 'subtopic'.The previous conversation context is provided to help with understanding the subject. However, if the new question is about a different topic, classify it separately.
@@ -67,12 +58,12 @@ class StudentProgressTracker:
         """
 
         try:
-            response = MODEL.generate_content(prompt)
+            response = MODEL.generate_content(prompt, call_site="classify_topic")
 
             # Debugging: Print the full raw response
             print("Raw model response:", response)
 
-            if not response or not response.candidates:
+            if not response or (not isinstance(response, str) and not response.candidates):
                 raise ValueError("No response from model.")
 
             # Extract the text content
@@ -91,7 +82,7 @@ class StudentProgressTracker:
             # Debugging: Print cleaned content before parsing JSON
             print("Cleaned content:", cleaned_content)
 
-            classification = extract_json(cleaned_content)
+            classification = extract_json(cleaned_content, dict)
             if not classification:
                 classification = json.loads(cleaned_content) if cleaned_content else {}
 
@@ -105,6 +96,7 @@ class StudentProgressTracker:
 
         except (json.JSONDecodeError, AttributeError, IndexError, ValueError) as e:
             print(f"Error in topic classification: {e} | Input: {user_input}")
+            METRICS.record_parse_failure("classify_topic")
             return "General", "General"
 
 
@@ -129,7 +121,7 @@ class StudentProgressTracker:
         Strictly return only one of these options: "Basic", "Intermediate", or "Advanced".
         """
 
-        response = MODEL.generate_content(prompt)
+        response = MODEL.generate_content(prompt, call_site="difficulty")
 
         try:
             if isinstance(response, str):
@@ -144,6 +136,7 @@ class StudentProgressTracker:
                 if level.lower() in difficulty.lower():
                     return level
             
+            METRICS.record_parse_failure("difficulty")
             return difficulty if difficulty in {"Basic", "Intermediate", "Advanced"} else "Basic" 
 
         except (AttributeError, IndexError) as e:
@@ -151,8 +144,19 @@ class StudentProgressTracker:
             return "Basic"
 
 
-    def update_progress(self, topic, subtopic, difficulty):
-        """Update student progress based on the latest question asked."""
+    def update_progress(self, topic, subtopic, difficulty, turn_id=None):
+        """
+        Update student progress based on the latest question asked.
+        A turn whose ``turn_id`` was already counted is ignored (background
+        replays); returns whether the progress was updated.
+        """
+        recorded_turns = self.progress.get("recorded_turns", [])
+        if turn_id is not None:
+            if turn_id in recorded_turns:
+                return False
+            # Only the last few turns can still be replayed
+            self.progress["recorded_turns"] = (recorded_turns + [turn_id])[-50:]
+        
         valid_difficulties = {"Basic", "Intermediate", "Advanced"}
         difficulty = difficulty if difficulty in valid_difficulties else "Basic"
 
@@ -167,6 +171,10 @@ class StudentProgressTracker:
 
         self.progress["difficulty_distribution"][difficulty] += 1 
         
+        # Most recent (topic, subtopic) pairs first, used to warm exercise pools
+        recent = [pair for pair in self.progress.get("recent_topics", []) if pair != [topic, subtopic]]
+        self.progress["recent_topics"] = ([[topic, subtopic]] + recent)[:10]
+        
         # Add timestamp to track learning streak
         if "activity_dates" not in self.progress:
             self.progress["activity_dates"] = []
@@ -178,7 +186,8 @@ class StudentProgressTracker:
             if len(self.progress["activity_dates"]) > 100:
                 self.progress["activity_dates"] = self.progress["activity_dates"][-100:]
 
-        db.update_progress(self.student_id, self.progress)  
+        db.update_progress(self.student_id, self.progress)
+        return True
         
         
 
@@ -194,7 +203,7 @@ Student Progress:
 Provide recommendations as a clear, numbered list with brief explanations for each."""
         
         try:
-            response = MODEL.generate_content(prompt, system_prompt=system_prompt)
+            response = MODEL.generate_content(prompt, system_prompt=system_prompt, call_site="recommendations")
             if isinstance(response, str):
                 return response
             else:
@@ -0,0 +1,207 @@
+"""Priority-aware concurrency governor, rate limiter and request coalescing for model calls."""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0  # Chat answers and the per-turn classification calls
+PRIORITY_BACKGROUND = 1   # Summaries and other off-request work
+PRIORITY_BATCH = 2        # Bulk generation: quizzes, flashcards, study plans
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+    PRIORITY_BATCH: "batch"
+}
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds: float, now: float):
+        """Stop handing out tokens for a while (provider told us to back off)."""
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class ModelScheduler:
+    """
+    Admit model calls in priority order under a per-provider token bucket and
+    a global max-in-flight limit.
+
+    Waiters form a single priority queue; only the head may start, so an
+    interactive request queued behind bulk generation jumps ahead of it. Batch
+    work is additionally kept out of the last ``reserved_interactive`` slots so
+    a long quiz cannot occupy every slot when a student asks a question.
+    """
+
+    def __init__(self, rate_limits: Dict[str, Tuple[float, float]], max_in_flight: int = 4, reserved_interactive: int = 1):
+        self.rate_limits = rate_limits
+        self.max_in_flight = max(1, max_in_flight)
+        self.reserved_interactive = min(reserved_interactive, self.max_in_flight - 1)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._stats = {
+            name: {"requests": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        if provider not in self._buckets:
+            rate, capacity = self.rate_limits.get(provider, (1.0, 5.0))
+            self._buckets[provider] = TokenBucket(rate, capacity)
+        return self._buckets[provider]
+
+    def _slot_limit(self, priority: int) -> int:
+        if priority >= PRIORITY_BATCH:
+            return self.max_in_flight - self.reserved_interactive
+        return self.max_in_flight
+
+    @contextmanager
+    def slot(self, provider: str, priority: int = PRIORITY_INTERACTIVE):
+        """Block until the call may start, then hold a slot for its duration."""
+        enqueued = time.monotonic()
+        entry = (priority, next(self._sequence))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay: Optional[float] = None
+                    if self._waiters[0] == entry and self._in_flight < self._slot_limit(priority):
+                        delay = self._bucket(provider).wait_time(now)
+                        if delay == 0:
+                            break
+                    self._cond.wait(timeout=delay)
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiters)
+            self._bucket(provider).take()
+            self._in_flight += 1
+            self._record_wait(priority, time.monotonic() - enqueued)
+            self._cond.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def penalize(self, provider: str, retry_after: float = 5.0):
+        """Back off a provider after it rate-limited us (e.g. HTTP 429)."""
+        with self._cond:
+            self._bucket(provider).block(retry_after, time.monotonic())
+            self._cond.notify_all()
+
+    def _record_wait(self, priority: int, waited: float):
+        stats = self._stats[PRIORITY_NAMES.get(priority, "batch")]
+        stats["requests"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def metrics(self) -> Dict:
+        """Snapshot of queue depth, in-flight calls and wait times per priority."""
+        with self._cond:
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiters:
+                depth[PRIORITY_NAMES.get(priority, "batch")] += 1
+
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": depth,
+                "wait_time": {
+                    name: {
+                        "requests": stats["requests"],
+                        "avg_wait": stats["total_wait"] / stats["requests"] if stats["requests"] else 0.0,
+                        "max_wait": stats["max_wait"]
+                    }
+                    for name, stats in self._stats.items()
+                }
+            }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: the first caller for a key runs the
+    function, callers arriving while it is in flight wait and share its result
+    (or exception). Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict] = {}
+        self.coalesced = 0
+        self.executed = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls)
+            }
@@ -0,0 +1,223 @@
+"""Declarative schemas for generated JSON payloads, with local repair and targeted follow-ups."""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from config import MODEL
+from utils import extract_json
+
+# A schema maps field name -> spec. Spec keys:
+#   type      str, int, float, bool, list or dict
+#   required  the payload is incomplete without it (otherwise ``default`` is filled in)
+#   default   value used when an optional field is missing or unusable
+#   items     element type for lists: a type, or a schema for lists of objects
+#   min_items fewer valid elements than this counts as missing
+#   example   shown to the model when the field has to be re-requested
+#   stringify any JSON value present (list, bool, null, ...) is converted with str(),
+#             i.e. to what print() shows for it
+
+MULTIPLE_CHOICE_SCHEMA = {
+    "question": {"type": str, "required": True, "example": "The question text"},
+    "options": {"type": list, "items": str, "required": True, "min_items": 2,
+                "example": ["option1", "option2", "option3", "option4"]},
+    "correct_answer": {"type": int, "required": True, "example": 0},
+    "explanation": {"type": str, "default": ""},
+    "hints": {"type": list, "items": str, "default": []}
+}
+
+SHORT_ANSWER_SCHEMA = {
+    "question": {"type": str, "required": True, "example": "The question text"},
+    "expected_keywords": {"type": list, "items": str, "required": True, "min_items": 1,
+                          "example": ["keyword1", "keyword2"]},
+    "explanation": {"type": str, "default": ""},
+    "hints": {"type": list, "items": str, "default": []}
+}
+
+TEST_CASE_SCHEMA = {
+    "input": {"type": str, "required": True},
+    "expected_output": {"type": str, "required": True, "stringify": True}
+}
+
+CODING_SCHEMA = {
+    "question": {"type": str, "required": True, "example": "The problem description"},
+    "starter_code": {"type": str, "default": ""},
+    "test_cases": {"type": list, "items": TEST_CASE_SCHEMA, "required": True, "min_items": 1,
+                   "example": [{"input": "function_name(1)", "expected_output": "2"}]},
+    "hints": {"type": list, "items": str, "default": []},
+    "solution": {"type": str, "default": ""}
+}
+
+EXERCISE_SCHEMAS = {
+    "multiple_choice": MULTIPLE_CHOICE_SCHEMA,
+    "short_answer": SHORT_ANSWER_SCHEMA,
+    "coding": CODING_SCHEMA
+}
+
+FLASHCARD_SCHEMA = {
+    "front": {"type": str, "required": True, "example": "Question or term"},
+    "back": {"type": str, "required": True, "example": "Answer or definition"},
+    "topic": {"type": str},
+    "subtopic": {"type": str}
+}
+
+DAY_PLAN_SCHEMA = {
+    "day": {"type": int},
+    "topics": {"type": list, "items": str, "default": []},
+    "activities": {"type": list, "items": str, "default": []},
+    "estimated_time": {"type": float, "default": 1.0},
+    "resources": {"type": list, "items": str, "default": []}
+}
+
+STUDY_PLAN_SCHEMA = {
+    "topic": {"type": str},
+    "duration_days": {"type": int},
+    "hours_per_day": {"type": float},
+    "daily_plans": {"type": list, "items": DAY_PLAN_SCHEMA, "required": True, "min_items": 1,
+                    "example": [{"day": 1, "topics": ["topic1"], "activities": ["activity1"],
+                                 "estimated_time": 1.0, "resources": ["resource1"]}]},
+    "learning_objectives": {"type": list, "items": str, "default": []},
+    "milestones": {"type": list, "items": str, "default": []}
+}
+
+_UNUSABLE = object()
+
+
+def _coerce(value: Any, spec_type: Any, items: Any = None) -> Any:
+    """Convert ``value`` to ``spec_type`` where the intent is clear, else _UNUSABLE."""
+    if value is None:
+        return _UNUSABLE
+    if isinstance(spec_type, dict):
+        repaired, missing = repair(value, spec_type) if isinstance(value, dict) else (None, ["*"])
+        return _UNUSABLE if missing else repaired
+    if spec_type is str:
+        if isinstance(value, str):
+            return value.strip() or _UNUSABLE
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return _UNUSABLE
+    if spec_type is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        return _UNUSABLE
+    if spec_type in (int, float):
+        if isinstance(value, bool):
+            return _UNUSABLE
+        if isinstance(value, (int, float)):
+            if spec_type is int and value != int(value):
+                return _UNUSABLE
+            return spec_type(value)
+        if isinstance(value, str):
+            match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*", value)
+            if match:
+                return _coerce(float(match.group(1)), spec_type)
+        return _UNUSABLE
+    if spec_type is list:
+        if isinstance(value, str):
+            # "a, b" or one item per line (list markers stripped)
+            parts = value.splitlines() if "\n" in value else value.split(",") if items is str else [value]
+            value = [re.sub(r"^\s*(?:[-*•]|\d+[.)]|[A-Za-z][.)])\s+", "", part) for part in parts]
+        elif isinstance(value, dict) and isinstance(items, dict):
+            value = [value]
+        if not isinstance(value, list):
+            return _UNUSABLE
+        if items is None:
+            return value
+        coerced = [_coerce(item, items) for item in value]
+        return [item for item in coerced if item is not _UNUSABLE]
+    if spec_type is dict:
+        return value if isinstance(value, dict) else _UNUSABLE
+    return value
+
+
+def repair(payload: Any, schema: Dict) -> Tuple[Dict, List[str]]:
+    """
+    Validate and locally repair a payload against a schema: coerce types,
+    drop unusable list elements and fill defaults for optional fields.
+    Returns the repaired copy and the required fields that are still missing.
+    Unknown fields are kept as they are.
+    """
+    repaired = dict(payload) if isinstance(payload, dict) else {}
+    missing = []
+    for name, spec in schema.items():
+        if spec.get("stringify") and name in repaired and not isinstance(repaired[name], str):
+            repaired[name] = str(repaired[name])
+        value = _coerce(repaired.get(name), spec.get("type"), spec.get("items"))
+        if value is not _UNUSABLE and isinstance(value, list) and len(value) < spec.get("min_items", 0):
+            value = _UNUSABLE
+        if value is not _UNUSABLE:
+            repaired[name] = value
+        elif "default" in spec:
+            default = spec["default"]
+            repaired[name] = list(default) if isinstance(default, list) else default
+        else:
+            repaired.pop(name, None)
+            if spec.get("required"):
+                missing.append(name)
+
+    if schema is MULTIPLE_CHOICE_SCHEMA:
+        _repair_correct_answer(payload if isinstance(payload, dict) else {}, repaired, missing)
+    return repaired, missing
+
+
+def _repair_correct_answer(original: Dict, repaired: Dict, missing: List[str]):
+    """Map letter or option-text answers to an index and check it is in range."""
+    options = repaired.get("options")
+    answer = original.get("correct_answer")
+    if "correct_answer" in missing and isinstance(answer, str) and options:
+        text = answer.strip()
+        letter = re.fullmatch(r"\(?([A-Za-z])[).]?", text)
+        if letter and ord(letter.group(1).upper()) - ord("A") < len(options):
+            index = ord(letter.group(1).upper()) - ord("A")
+        else:
+            folded = [option.strip().casefold() for option in options]
+            index = folded.index(text.casefold()) if text.casefold() in folded else None
+        if index is not None:
+            repaired["correct_answer"] = index
+            missing.remove("correct_answer")
+
+    index = repaired.get("correct_answer")
+    if isinstance(index, int) and options and not 0 <= index < len(options):
+        if 1 <= index == len(options):
+            # 1-based answer pointing at the last option
+            repaired["correct_answer"] = index - 1
+        else:
+            del repaired["correct_answer"]
+            missing.append("correct_answer")
+
+
+def complete(payload: Any, schema: Dict, context: str, call_site: str,
+             priority: Optional[int] = None) -> Tuple[Dict, List[str]]:
+    """
+    Repair a payload locally and, if required fields are still missing, ask the
+    model for just those fields in one small follow-up prompt. Returns the
+    repaired payload and whatever is still missing afterwards.
+    """
+    repaired, missing = repair(payload, schema)
+    if not missing:
+        return repaired, missing
+
+    fields = {name: schema[name].get("example", f"<{name}>") for name in missing}
+    known = {name: value for name, value in repaired.items() if name in schema}
+    prompt = f"""{context}
+
+This JSON object is incomplete:
+{json.dumps(known, indent=2)}
+
+Return a JSON object with only the missing fields {", ".join(missing)}, consistent with the fields above, in this format:
+{json.dumps(fields, indent=2)}"""
+
+    kwargs = {"call_site": f"{call_site}_repair", "max_tokens": 1024 if "daily_plans" in missing else 400}
+    if priority is not None:
+        kwargs["priority"] = priority
+    try:
+        response = MODEL.generate_content(prompt, **kwargs)
+        if isinstance(response, str):
+            patch = extract_json(response, dict)
+            if isinstance(patch, dict):
+                merged = dict(payload) if isinstance(payload, dict) else {}
+                merged.update({name: value for name, value in patch.items() if name in missing})
+                return repair(merged, schema)
+    except Exception as e:
+        print(f"Error requesting missing fields: {e}")
+    return repaired, missing
@@ -0,0 +1,100 @@
+"""Vectorized SM-2 scheduling for workload forecasts and bulk rescheduling."""
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+
+class VectorizedSM2:
+    """
+    SM-2 state for a whole deck held in NumPy arrays.
+
+    ``apply_reviews`` performs the same arithmetic as
+    ``FlashcardSystem._apply_review`` (same float64 operations, interval
+    truncation and mastery rule), so a vectorized pass gives results identical
+    to reviewing the cards one by one. Due dates are epoch seconds.
+    """
+
+    def __init__(self, card_ids: List[str], ease: np.ndarray, interval: np.ndarray,
+                 repetitions: np.ndarray, due: np.ndarray, mastered: np.ndarray):
+        self.card_ids = card_ids
+        self.ease = ease.astype(np.float64)
+        self.interval = interval.astype(np.int64)
+        self.repetitions = repetitions.astype(np.int64)
+        self.due = due.astype(np.float64)
+        self.mastered = mastered.astype(bool)
+
+    @classmethod
+    def from_cards(cls, cards: List[Dict], due_timestamps: List[float]) -> "VectorizedSM2":
+        """Build arrays from cards and their due dates as epoch seconds."""
+        return cls(
+            [card.get("id") for card in cards],
+            np.array([card.get("ease_factor", 2.5) for card in cards], dtype=np.float64),
+            np.array([card.get("interval_days", 1) for card in cards], dtype=np.int64),
+            np.array([card.get("repetitions", 0) for card in cards], dtype=np.int64),
+            np.array(due_timestamps, dtype=np.float64),
+            np.array([bool(card.get("mastered", False)) for card in cards], dtype=bool)
+        )
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    def apply_reviews(self, quality: Union[int, np.ndarray], now: float, mask: Optional[np.ndarray] = None):
+        """Apply an SM-2 review with ``quality`` (scalar or per card) to the cards in ``mask``."""
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        q = np.broadcast_to(np.asarray(quality, dtype=np.int64), (len(self),))[mask]
+
+        ease = self.ease[mask]
+        interval = self.interval[mask]
+        repetitions = self.repetitions[mask]
+
+        ease = np.maximum(1.3, ease + (0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)))
+
+        passed = q >= 3
+        grown = np.floor(interval * ease).astype(np.int64)
+        new_interval = np.where(repetitions == 0, 1, np.where(repetitions == 1, 6, grown))
+        interval = np.where(passed, new_interval, 1)
+        repetitions = np.where(passed, repetitions + 1, 0)
+
+        self.ease[mask] = ease
+        self.interval[mask] = interval
+        self.repetitions[mask] = repetitions
+        self.due[mask] = now + interval * SECONDS_PER_DAY
+        self.mastered[mask] = (repetitions >= 5) & (interval >= 30)
+
+    def forecast(self, days: int, now: float, quality: Union[int, np.ndarray] = 4) -> List[int]:
+        """
+        Simulate ``days`` days of reviews and return the number of cards due
+        each day, assuming every due card is reviewed that day with ``quality``.
+        The deck itself is not modified.
+        """
+        sim = self.copy()
+        counts = []
+        day_start = now
+        for _ in range(days):
+            day_end = day_start + SECONDS_PER_DAY
+            due_today = (~sim.mastered) & (sim.due < day_end)
+            counts.append(int(due_today.sum()))
+            if due_today.any():
+                sim.apply_reviews(quality, max(day_start, now), due_today)
+            day_start = day_end
+        return counts
+
+    def reschedule_overdue(self, now: float, spread_days: int) -> np.ndarray:
+        """
+        Spread overdue, unmastered cards evenly over the next ``spread_days``
+        days, most overdue first. Returns the indices of rescheduled cards.
+        """
+        overdue = np.flatnonzero((~self.mastered) & (self.due <= now))
+        if len(overdue) == 0 or spread_days <= 0:
+            return overdue
+        order = overdue[np.argsort(self.due[overdue], kind="stable")]
+        day_offsets = (np.arange(len(order)) * spread_days) // len(order)
+        self.due[order] = now + day_offsets * SECONDS_PER_DAY
+        return order
+
+    def copy(self) -> "VectorizedSM2":
+        return VectorizedSM2(list(self.card_ids), self.ease.copy(), self.interval.copy(),
+                             self.repetitions.copy(), self.due.copy(), self.mastered.copy())
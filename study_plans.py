@@ -3,7 +3,10 @@ import json
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from config import MODEL
+from scheduler import PRIORITY_BATCH
+from instrumentation import METRICS
 from database import Database
+from schemas import STUDY_PLAN_SCHEMA, complete
 
 db = Database("./tutor_memory")
 
@@ -43,16 +46,25 @@ Return JSON in this format:
 Make the plan progressive, starting with basics and building to advanced concepts."""
         
         try:
-            response = MODEL.generate_content(prompt, system_prompt=system_prompt)
+            response = MODEL.generate_content(prompt, system_prompt=system_prompt, priority=PRIORITY_BATCH, call_site="study_plan")
             if isinstance(response, str):
                 from utils import extract_json
-                plan = extract_json(response)
+                plan = extract_json(response, dict)
+                context = f"A {duration_days}-day study plan for learning {topic}, about {hours_per_day} hours per day."
+                plan, missing = complete(plan, STUDY_PLAN_SCHEMA, context, "study_plan", PRIORITY_BATCH)
+                if missing:
+                    # Never save a plan without days
+                    METRICS.record_parse_failure("study_plan")
+                    return self._get_default_plan(topic, duration_days, hours_per_day)
                 
                 # Add dates
                 start_date = datetime.now()
-                if "daily_plans" in plan:
-                    for i, day_plan in enumerate(plan["daily_plans"]):
-                        day_plan["date"] = str((start_date + timedelta(days=i)).date())
+                for i, day_plan in enumerate(plan["daily_plans"]):
+                    day_plan.setdefault("day", i + 1)
+                    day_plan["date"] = str((start_date + timedelta(days=i)).date())
+                plan.setdefault("topic", topic)
+                plan.setdefault("duration_days", duration_days)
+                plan.setdefault("hours_per_day", hours_per_day)
                 
                 plan["created_at"] = str(datetime.now())
                 plan["student_id"] = self.student_id
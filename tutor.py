@@ -1,20 +1,76 @@
 import json
+import weakref
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from config import MODEL
 from database import Database
 from progress_tracker import StudentProgressTracker
 from achievements import AchievementSystem
 from multimodal import MultimodalProcessor
+from background import BACKGROUND
+from context import ContextAssembler
+from memory import ConversationMemory, SummaryWorker
 
 db = Database("./tutor_memory")
 
+# Live tutors by student, so background tasks update the same in-memory state
+_live_tutors = weakref.WeakValueDictionary()
+
+
+def _record_turn(payload: Dict):
+    """
+    Background handler: update progress, check achievements and store the turn.
+    Safe to replay: the turn's timestamp identifies it in both the progress
+    and the stored history, so neither is counted or appended twice.
+    """
+    student_id = payload["student_id"]
+    entry = payload["conversation_entry"]
+    turn_id = entry.get("timestamp")
+    tutor = _live_tutors.get(student_id)
+    progress_tracker = tutor.progress_tracker if tutor else StudentProgressTracker(student_id)
+    achievement_system = tutor.achievement_system if tutor else AchievementSystem(student_id)
+
+    updated = progress_tracker.update_progress(
+        topic=payload["topic"],
+        subtopic=payload["subtopic"],
+        difficulty=payload["difficulty"],
+        turn_id=turn_id
+    )
+
+    if updated:
+        for achievement in achievement_system.check_achievements(progress_tracker.progress):
+            if achievement:
+                BACKGROUND.notify(student_id, achievement)
+
+    history = db.get_conversation(student_id) or []
+    if turn_id is None or not any(stored.get("timestamp") == turn_id for stored in history):
+        db.store_conversation(student_id, entry)
+
+    memory = tutor.memory if tutor else ConversationMemory(student_id)
+    if memory.is_due(payload.get("turn_count", 0)):
+        SUMMARIES.request(student_id)
+
+
+def _summarize_conversation(student_id: str):
+    """Fold recent turns into the student's rolling summary."""
+    tutor = _live_tutors.get(student_id)
+    memory = tutor.memory if tutor else ConversationMemory(student_id)
+    memory.update(db.get_conversation(student_id) or [])
+
+
+SUMMARIES = SummaryWorker(_summarize_conversation)
+
+BACKGROUND.register("tutor_turn", _record_turn)
+
 class TutorAssistant:
     def __init__(self, student_id):
         self.student_id = student_id
         self.progress_tracker = StudentProgressTracker(student_id)
         self.achievement_system = AchievementSystem(student_id)
         self.multimodal_processor = MultimodalProcessor()
+        self.context_assembler = ContextAssembler(max_recent=5, max_relevant=3)
+        self.memory = ConversationMemory(student_id)
+        _live_tutors[student_id] = self
 
     def tutor_response(self, user_input: str, image_file=None, document_file=None, document_type: str = None) -> Dict:
         """Generate a tutor response based on the student's input and progress."""
@@ -32,22 +88,13 @@ class TutorAssistant:
         topic, subtopic = self.progress_tracker.classify_topic_and_subtopic(user_input)
         difficulty = self.progress_tracker.analyze_difficulty(user_input)
         
-        # Update progress
-        self.progress_tracker.update_progress(topic=topic, subtopic=subtopic, difficulty=difficulty)
-        
-        # Check for new achievements
+        # Progress, achievements and storage are updated in the background
         progress_data = self.progress_tracker.progress
-        new_achievements = self.achievement_system.check_achievements(progress_data)
         
         # Retrieve past conversation history
         past_conversation = db.get_conversation(self.student_id) or []
         relevant_interactions = db.retrieve_relevant_interactions(user_input, self.student_id) or []
 
-        # Combine past with relevant
-        num_past = min(5, len(past_conversation))
-        conversation_history = past_conversation[-num_past:] if past_conversation else []
-        conversation_history.extend(relevant_interactions[:3])  # Limit relevant interactions
-
         # Prepare context with progress information
         progress_summary = f"""
 Student Progress Summary:
@@ -57,16 +104,8 @@ Student Progress Summary:
 - Difficulty Level: {difficulty}
 """
         
-        # Prepare conversation context
-        formatted_conversation = []
-        for entry in conversation_history:
-            if isinstance(entry, dict):
-                if "question" in entry and "response" in entry:
-                    formatted_conversation.append(f"Student: {entry['question']}\nAI Tutor: {entry['response']}")
-                elif "user" in entry and "assistant" in entry:
-                    formatted_conversation.append(f"Student: {entry['user']}\nAI Tutor: {entry['assistant']}")
-
-        context = "\n".join(formatted_conversation[-3:])  # Last 3 conversations
+        # Prepare conversation context (deduplicated, within the token budget)
+        context = self.context_assembler.build(past_conversation, relevant_interactions)
         
         # Enhanced system prompt
         system_prompt = """You are an expert AI tutor. Your role is to:
@@ -88,7 +127,7 @@ Keep responses concise but comprehensive. If the student provides images or docu
                 # Summarize if too long
                 summary_prompt = f"Summarize the key points from this document:\n\n{document_text[:2000]}..."
                 try:
-                    summary = MODEL.generate_content(summary_prompt)
+                    summary = MODEL.generate_content(summary_prompt, call_site="document_summary")
                     if isinstance(summary, str):
                         document_text = summary
                 except:
@@ -98,17 +137,24 @@ Keep responses concise but comprehensive. If the student provides images or docu
         else:
             enhanced_input = user_input
         
-        prompt = f"""{progress_summary}
-
+        # Compact summary of everything older than the raw context window
+        memory_summary = f"\nSummary of earlier sessions:\n{self.memory.summary}\n" if self.memory.summary else ""
+        
+        prompt = f"""{progress_summary}{memory_summary}
 Previous conversation context:
 {context}
 
+Student: {enhanced_input}
+AI Tutor:"""
+        # Sent instead while the provider still holds this session's earlier
+        # turns (Ollama context carry-over); fallbacks always get the full prompt
+        session_prompt = f"""{progress_summary}
 Student: {enhanced_input}
 AI Tutor:"""
         
         try:
             # Pass image_data to model if available (Google Gemini will use it)
-            response = MODEL.generate_content(prompt, system_prompt=system_prompt, image_data=image_data)
+            response = MODEL.generate_content(prompt, system_prompt=system_prompt, image_data=image_data, session_id=self.student_id, call_site="tutor_answer", session_prompt=session_prompt)
             
             if isinstance(response, str):
                 tutor_reply = response
@@ -133,16 +179,28 @@ AI Tutor:"""
             "has_document": document_text is not None
         }
         
-        db.store_conversation(self.student_id, conversation_entry)
+        BACKGROUND.submit("tutor_turn", {
+            "student_id": self.student_id,
+            "topic": topic,
+            "subtopic": subtopic,
+            "difficulty": difficulty,
+            "conversation_entry": conversation_entry,
+            "turn_count": len(past_conversation) + 1
+        })
 
         return {
             "response": tutor_reply,
             "topic": topic,
             "subtopic": subtopic,
             "difficulty": difficulty,
-            "new_achievements": new_achievements
+            # Achievements unlocked by earlier turns; later ones arrive on the next render
+            "new_achievements": self.pop_achievement_notifications()
         }
     
+    def pop_achievement_notifications(self) -> List[Dict]:
+        """Return achievements unlocked by background tasks since the last call."""
+        return BACKGROUND.drain_notifications(self.student_id)
+    
     def get_conversation_summary(self) -> str:
         """Get a summary of recent conversations."""
         conversations = db.get_conversation(self.student_id) or []
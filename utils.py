@@ -2,7 +2,7 @@
 import json
 import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import hashlib
 
 def clean_text(text: str) -> str:
@@ -15,26 +15,143 @@ def clean_text(text: str) -> str:
     text = text.replace('\x00', '')
     return text
 
-def extract_json(text: str) -> dict:
-    """Extract JSON from text, handling code blocks."""
+def _balanced_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    (start, end) of every balanced ``{...}``/``[...]`` in ``text``, found in one
+    pass. Quotes only count inside brackets, so brackets in JSON strings are
+    ignored while a stray quote in the surrounding prose is not mistaken for one.
+    """
+    spans = []
+    stack = []
+    in_string = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = bool(stack)
+        elif ch in '{[':
+            stack.append(i)
+        elif ch in '}]' and stack:
+            spans.append((stack.pop(), i + 1))
+    return spans
+
+def extract_json(text: str, expected: type = None) -> Any:
+    """
+    Extract a JSON object or array from text, handling code blocks and surrounding prose.
+
+    With ``expected`` (``dict`` or ``list``) only a value of that type is
+    returned, the largest one, so a stray "[1]" in the prose does not hide the
+    real payload (an empty one if there is none). Otherwise the first balanced
+    value that parses is returned.
+    """
+    if not text:
+        return expected() if expected in (dict, list) else {}
     # Remove markdown code blocks
     text = re.sub(r'```json\s*\n?', '', text)
     text = re.sub(r'```\s*\n?', '', text)
     text = text.strip()
     
-    # Try to find JSON object
-    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-    if json_match:
-        try:
-            return json.loads(json_match.group())
-        except json.JSONDecodeError:
-            pass
-    
     # Try parsing the whole text
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return {}
+        value = json.loads(text)
+        if expected is None or isinstance(value, expected):
+            return value
+    except (json.JSONDecodeError, RecursionError):
+        pass
+    
+    spans = _balanced_spans(text)
+    if expected in (dict, list):
+        opening = '{' if expected is dict else '['
+        candidates = sorted((span for span in spans if text[span[0]] == opening), key=lambda span: span[0] - span[1])
+    else:
+        candidates = sorted(spans)
+    for start, end in candidates:
+        try:
+            return json.loads(text[start:end])
+        except (json.JSONDecodeError, RecursionError):
+            continue
+    
+    return expected() if expected in (dict, list) else {}
+
+class IncrementalJSONExtractor:
+    """
+    Pull complete items out of a JSON array while the text is still streaming.
+
+    Feed chunks as they arrive; ``feed`` returns the elements of the first
+    top-level array (e.g. a flashcard list) that were completed by that chunk.
+    Prose and code fences before the JSON are skipped, as are bracketed
+    values that complete without any items (e.g. "see [1]" in the prose).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._root = None
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self._root_items = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk and return the items it completed."""
+        self.buffer += chunk
+        items = []
+        text = self.buffer
+        while self._pos < len(text) and not self.done:
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if not self._depth:
+                # Outside the root value: wait for it to start
+                if ch in '{[':
+                    self._root = ch
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 1 and self._root == '[':
+                    self._item_start = i
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if not self._depth:
+                    if self._root_items:
+                        self.done = True
+                    else:
+                        # Not the payload; keep scanning for the next root
+                        self._item_start = None
+                elif self._depth == 1 and self._item_start is not None:
+                    try:
+                        items.append(json.loads(text[self._item_start:i + 1]))
+                        self._root_items += 1
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+        return items
+
+    def result(self) -> Any:
+        """Parse everything fed so far as a whole, preferring the array the items come from."""
+        return extract_json(self.buffer, list)
 
 def calculate_streak(dates: List[str]) -> int:
     """Calculate learning streak from list of date strings."""
@@ -86,6 +203,33 @@ def generate_id(text: str) -> str:
     """Generate a unique ID from text."""
     return hashlib.md5(text.encode()).hexdigest()[:12]
 
+def normalize_text(text: str) -> str:
+    """Fold case, punctuation and whitespace so near-identical strings compare equal."""
+    text = re.sub(r'[^\w\s]', ' ', (text or "").casefold())
+    return ' '.join(text.split())
+
+def text_fingerprint(text: str) -> str:
+    """Stable hash of the normalized text."""
+    return hashlib.sha1(normalize_text(text).encode()).hexdigest()
+
+def text_shingles(text: str, size: int = 3) -> set:
+    """Character shingles of the normalized text (the whole text if it is shorter)."""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+# Words that do not change what a flashcard front asks ("i" is kept: World War I vs II)
+_FUNCTION_WORDS = frozenset("""
+a an the is are was were be been being am s do does did of in on at to for from by with
+and or as it its this that these those what whats which who whom how why when where
+can could should would will shall may might must please explain define describe
+""".split())
+
+def content_words(text: str) -> frozenset:
+    """Normalized words of the text without function words."""
+    return frozenset(word for word in normalize_text(text).split() if word not in _FUNCTION_WORDS)
+
 def validate_student_id(student_id: str) -> bool:
     """Validate student ID format."""
     if not student_id or len(student_id) < 3: